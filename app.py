@@ -1,38 +1,153 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
+
+import numpy as np
 import pandas as pd
-from dash import Dash, html, dcc, Input, Output
-import plotly.express as px
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, callback_context, no_update
+from flask import Response, abort, jsonify, request, send_file
+# graph_objects rather than plotly.express: cheaper to import and to build a single trace
+import plotly.graph_objects as go
+
+import columnar_store
+import partitioned_dataset
+import price_impact
+import static_snapshot
+from compact_dataset import CompactDataset, to_day
+from downsampling import downsample
+from figure_cache import FigureCache
+from instrumentation import METRICS, instrument_callback
+from live_data import WATCH_INTERVAL, LiveDataset
+from region_index import PRICE_INCREASE_DATE, RegionIndex
+from shared_cache import SharedFigureCache
 
 # Path to your CSV
 FILE_PATH = "formatted_data.csv"
+# Pre-sorted, memory-mapped copy of the CSV written by single_formatted_output.py
+STORE_PATH = columnar_store.store_path_for(FILE_PATH)
+# All products' sales, partitioned by product and month, also written by ingestion
+DATASET_PATH = partitioned_dataset.dataset_path_for(FILE_PATH)
+# Product served from FILE_PATH/STORE_PATH; others are read from DATASET_PATH on demand
+PRODUCT = 'pink morsel'
+# Chart resolutions: every row, bucket totals, or LTTB decimation
+RESOLUTIONS = ['raw', 'daily', 'weekly', 'monthly', 'auto']
+# How often browsers poll for a new data version
+REFRESH_INTERVAL_MS = 5000
+# Switch regions in the browser from series shipped once, instead of per-click callbacks
+CLIENTSIDE = os.environ.get('SALES_CLIENTSIDE') == '1'
+# Snapshot written by static_snapshot.py whose figures are served instead of being built
+PRECOMPUTED_DIRECTORY = os.environ.get('SALES_PRECOMPUTED_DIR') or None
+# Startup-optimized mode: serve (and answer readiness probes) before any figure is built
+FAST_START = os.environ.get('SALES_FAST_START') == '1'
+# Share built figures between worker processes through this directory ('auto' for a private one)
+SHARED_CACHE_DIRECTORY = os.environ.get('SALES_SHARED_CACHE_DIR') or None
+
+def data_version():
+    """Return a token that changes whenever the data file or columnar store changes"""
+    parts = []
+    for path in [FILE_PATH, os.path.join(STORE_PATH, columnar_store.META_FILE_NAME)]:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{stat.st_size}-{stat.st_mtime_ns}")
+    return ":".join(parts)
 
 def load_data():
-    """Load and prepare the data"""
-    df = pd.read_csv(FILE_PATH)
-    df['date'] = pd.to_datetime(df['date'])  # ensure date column is datetime
-    df = df.sort_values('date')
-    # Filter only Pink Morsel if needed
-    pink_morsel_df = df
-    return pink_morsel_df
-
-def create_sales_chart(dataset, selected_region='all'):
-    """Function to generate the line chart"""
-    if selected_region != 'all':
-        dataset = dataset[dataset['region'].str.lower() == selected_region]
-    
+    """Load the data as a compact, date-sorted CompactDataset"""
+    # Prefer the columnar store when it was built from the current CSV
+    dataset = columnar_store.read_store(STORE_PATH, FILE_PATH)
+    if dataset is not None:
+        return dataset
+
+    df = pd.read_csv(FILE_PATH, dtype={'sales': np.float64, 'date': str, 'region': str})
+    return CompactDataset.from_frame(df)
+
+def zoom_range(relayout_data):
+    """Return the zoomed (start, end) x-axis range from relayoutData, or None"""
+    if not relayout_data:
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        return (relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]'])
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'])
+    return None
+
+def select_chart_data(index, selected_region='all', resolution='raw', x_range=None):
+    """Return the date and sales columns to plot for a view and the largest plotted sales value
+
+    Non-raw resolutions aggregate or decimate server-side; x_range restricts
+    the data to a zoomed window first so zooming in reveals more detail.
+    """
+    dates, sales = index.series(selected_region)
+    if resolution == 'raw' and x_range is None:
+        return {'date': dates, 'sales': sales}, index.stats(selected_region)['max']
+
+    if x_range is not None:
+        # Dates are whole days: keep those from the first midnight in the window to the last
+        first, last = to_day(pd.Timestamp(x_range[0]).ceil('D')), to_day(x_range[1])
+        window = slice(np.searchsorted(dates, first), np.searchsorted(dates, last, side='right'))
+        dates, sales = dates[window], sales[window]
+    if resolution != 'raw':
+        dates, sales = downsample(dates, sales, resolution)
+    max_sales = float(sales.max()) if len(sales) else float('nan')
+    return {'date': dates, 'sales': sales}, max_sales
+
+def region_series(index, product=PRODUCT, report=None):
+    """Return compact per-region series for drawing raw views in the browser
+
+    Dates are sent as integer day offsets from the first date, which keeps the
+    payload small and compresses well. With a price impact report, each region
+    also carries its summary text so the browser can switch it too.
+    """
+    regions = {}
+    for region in ['all'] + index.regions:
+        regions[region] = {
+            'days': index.days(region).tolist(),
+            'sales': index.series(region)[1].tolist(),
+            'max': index.stats(region)['max'],
+        }
+        if report is not None:
+            regions[region]['summary'] = price_impact.summary_text(report, region)
+    return {'product': product, 'start': str(index.start), 'regions': regions}
+
+def create_sales_chart(dataset, selected_region='all', resolution='raw', x_range=None, product=PRODUCT):
+    """Function to generate the line chart from a RegionIndex (or a DataFrame)"""
+    if not isinstance(dataset, RegionIndex):
+        dataset = RegionIndex(dataset)
+
+    with METRICS.stage('filter'):
+        dataset, max_sales = select_chart_data(dataset, selected_region, resolution, x_range)
+    with METRICS.stage('figure_build'):
+        return build_sales_figure(dataset, selected_region, resolution, max_sales, product)
+
+def build_sales_figure(dataset, selected_region, resolution, max_sales, product=PRODUCT):
+    """Build the styled line chart for already-selected date and sales columns"""
     region_display = selected_region.capitalize() if selected_region != 'all' else 'All Regions'
     
-    fig = px.line(
-        dataset,
-        x='date',
-        y='sales',
-        title=f'Pink Morsel Sales Over Time - {region_display}',
-        labels={'date': 'Date', 'sales': 'Sales ($)'},
-        color_discrete_sequence=['#FF6B9D']  # Pink color for the line
+    # WebGL for long series, as plotly.express does
+    trace = go.Scattergl if len(dataset['date']) >= 1000 else go.Scatter
+    fig = go.Figure(
+        trace(
+            x=dataset['date'],
+            y=dataset['sales'],
+            mode='lines',
+            line=dict(color='#FF6B9D'),  # Pink color for the line
+            name='',
+            showlegend=False
+        ),
+        layout=dict(
+            title=dict(text=f'{product.title()} Sales Over Time - {region_display}'),
+            xaxis=dict(title=dict(text='Date')),
+            yaxis=dict(title=dict(text='Sales ($)'))
+        )
     )
     
     # Add vertical line for price increase
     fig.add_vline(
-        x=pd.Timestamp('2021-01-15'),
+        x=PRICE_INCREASE_DATE,
         line_dash="dash",
         line_color="#FF3333",
         line_width=2,
@@ -41,8 +156,8 @@ def create_sales_chart(dataset, selected_region='all'):
 
     # Add annotation for price increase
     fig.add_annotation(
-        x=pd.Timestamp('2021-01-15'),
-        y=dataset['sales'].max(),
+        x=PRICE_INCREASE_DATE,
+        y=max_sales,
         text="Price Increase<br>Jan 15, 2021",
         showarrow=True,
         arrowhead=2,
@@ -84,7 +199,9 @@ def create_sales_chart(dataset, selected_region='all'):
             font_family="Arial"
         ),
         margin=dict(l=60, r=30, t=80, b=60),
-        showlegend=False
+        showlegend=False,
+        # Keep the user's zoom while a zoomed view is re-aggregated
+        uirevision=f'{selected_region}-{resolution}'
     )
     
     # Update line style
@@ -95,14 +212,129 @@ def create_sales_chart(dataset, selected_region='all'):
     
     return fig
 
-def create_app():
-    """Create and return the Dash app instance"""
+def create_app(watch_interval=WATCH_INTERVAL, clientside=CLIENTSIDE, precomputed=PRECOMPUTED_DIRECTORY,
+               fast_start=FAST_START, shared_cache=SHARED_CACHE_DIRECTORY):
+    """Create and return the Dash app instance
+
+    With a watch_interval, a background thread hot-swaps the dataset whenever
+    the data files change; pass None to load the data once. With clientside,
+    region changes are handled in the browser and the server callback only
+    runs for resolution, zoom, product and data changes. With a precomputed
+    snapshot directory, figures it holds for the current data are read from
+    disk instead of being built. With fast_start, the layout ships without a
+    figure (the initial callback supplies it) and app.warm_up() builds the
+    default figure in the background. With a shared_cache directory ('auto'
+    for a private temporary one), figures built by any worker process forked
+    from this app are reused by all of them.
+    """
     app = Dash(__name__)
-    
-    # Load data
-    pink_morsel_df = load_data()
+
+    # Serialized figures keyed on (region, data version)
+    if shared_cache:
+        figure_cache = SharedFigureCache(None if shared_cache == 'auto' else shared_cache)
+    else:
+        figure_cache = FigureCache()
+
+    def cache_counters():
+        """This process's figure cache counters, for /metrics"""
+        cache = figure_cache.stats()
+        return {f'figure_cache_{name}_total': cache[name]
+                for name in ('hits', 'misses', 'evictions', 'shared_hits') if name in cache}
+
+    # Workers forked from this app report /metrics summed over all of them
+    if METRICS.enabled and isinstance(figure_cache, SharedFigureCache):
+        METRICS.share(os.path.join(figure_cache.directory, 'metrics'), cache_counters)
+
+    # Load data; the region index is built once per data version so callbacks
+    # slice per-region blocks instead of scanning every row
+    def load_index():
+        """Load the data and index it by region"""
+        with METRICS.stage('load_data'):
+            pink_morsel_df = load_data()
+        return RegionIndex(pink_morsel_df)
+
+    dataset = LiveDataset(
+        load_index,
+        data_version,
+        on_swap=lambda version: figure_cache.clear()
+    )
+    if watch_interval:
+        dataset.start(watch_interval)
+    app.dataset = dataset
+
+    # Other products are loaded from their own partitions only when selected,
+    # keeping the indexes of the few most recently viewed
+    product_indexes = FigureCache(max_entries=4)
+    product_lists = FigureCache(max_entries=1)
+
+    def product_names():
+        """Return the selectable products, re-read whenever ingestion rewrites the partitions"""
+        version = partitioned_dataset.manifest_version(DATASET_PATH)
+        return product_lists.get_or_build(version, lambda: [PRODUCT] + [
+            product for product in sorted(partitioned_dataset.read_manifest(DATASET_PATH)) if product != PRODUCT
+        ])
+
+    def product_options():
+        """Options for the product selector"""
+        return [{'label': product.title(), 'value': product} for product in product_names()]
+
+    def product_data(product):
+        """Return (version, index) for a product"""
+        if product == PRODUCT:
+            return dataset.current
+        version = partitioned_dataset.manifest_version(DATASET_PATH)
+        return version, product_indexes.get_or_build(
+            (product, version),
+            lambda: RegionIndex(partitioned_dataset.load_product(DATASET_PATH, product))
+        )
+
+    snapshot = static_snapshot.load_manifest(precomputed)
+
+    def figure_json(selected_region, resolution='raw', x_range=None, product=PRODUCT):
+        """Return the figure JSON for a view, building it on a cache miss"""
+        version, index = product_data(product)
+
+        def build():
+            name = None
+            if snapshot is not None and x_range is None:
+                # Snapshots are keyed on the data's content, which survives touches and copies
+                content_hash = figure_cache.get_or_build(
+                    ('content', product, version), lambda: index.dataset.content_hash()
+                )
+                name = static_snapshot.figure_file(snapshot, product, selected_region, resolution, content_hash)
+            if name is not None:
+                with open(os.path.join(precomputed, name), mode='r') as figure_file:
+                    return figure_file.read()
+            fig = create_sales_chart(index, selected_region, resolution, x_range, product)
+            with METRICS.stage('serialize'):
+                return fig.to_json()
+
+        return figure_cache.get_or_build((product, selected_region, resolution, x_range, version), build)
+
+    def impact_report(product=PRODUCT):
+        """Return a product's before/after price increase stats, computed once per data version"""
+        version, index = product_data(product)
+        return figure_cache.get_or_build(
+            ('impact', product, version),
+            lambda: price_impact.impact_report(index.dataset)
+        )
+
+    app.product_names = product_names
+    app.product_data = product_data
+    app.figure_json = figure_json
+    app.impact_report = impact_report
+
+    def warm_up():
+        """Build the default figure in a background thread so the first page view hits the cache"""
+        thread = threading.Thread(target=figure_json, args=('all',), daemon=True)
+        thread.start()
+        return thread
+
+    app.warm_up = warm_up
+    initial_figure = {'data': [], 'layout': {}} if fast_start else json.loads(figure_json('all'))
     
     # Layout of the app with enhanced styling
+    layout_started = time.perf_counter()
     app.layout = html.Div(
         style={
             'backgroundColor': '#FFF5FA',
@@ -158,6 +390,17 @@ def create_app():
                     'marginBottom': '30px'
                 },
                 children=[
+                    # Product selector; only the chosen product's partitions are read
+                    html.Div(
+                        dcc.Dropdown(
+                            id='product_selector',
+                            options=product_options(),
+                            value=PRODUCT,
+                            clearable=False,
+                            style={'width': '300px', 'margin': '0 auto'}
+                        ),
+                        style={'marginBottom': '20px'}
+                    ),
                     html.H2(
                         "Region Filter",
                         style={
@@ -210,6 +453,34 @@ def create_app():
                         ),
                         style={'marginBottom': '10px'}
                     ),
+
+                    # Chart resolution; aggregated views re-aggregate when zoomed
+                    html.Div(
+                        dcc.RadioItems(
+                            id='resolution_selector',
+                            options=[
+                                {'label': 'Every Record', 'value': 'raw'},
+                                {'label': 'Daily', 'value': 'daily'},
+                                {'label': 'Weekly', 'value': 'weekly'},
+                                {'label': 'Monthly', 'value': 'monthly'},
+                                {'label': 'Auto', 'value': 'auto'}
+                            ],
+                            value='raw',
+                            inline=True,
+                            labelStyle={
+                                'display': 'inline-block',
+                                'margin': '5px 10px',
+                                'padding': '6px 15px',
+                                'borderRadius': '8px',
+                                'border': '1px solid #FFD1DC',
+                                'cursor': 'pointer',
+                                'fontSize': '14px'
+                            },
+                            inputStyle={'marginRight': '6px'},
+                            style={'textAlign': 'center', 'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap'}
+                        ),
+                        style={'marginBottom': '10px'}
+                    ),
                     
                     # Key Insight Box
                     html.Div(
@@ -229,6 +500,11 @@ def create_app():
                                 "The red dashed line marks the price increase on January 15, 2021. "
                                 "Use the region filters to see how different areas responded to the price change.",
                                 style={'color': '#666666', 'margin': '0', 'fontSize': '14px'}
+                            ),
+                            html.P(
+                                id='impact_summary',
+                                style={'color': '#D6336C', 'margin': '8px 0 0 0', 'fontSize': '14px',
+                                       'fontWeight': 'bold'}
                             )
                         ]
                     )
@@ -246,10 +522,15 @@ def create_app():
                 children=[
                     dcc.Graph(
                         id='sales_graph',
-                        figure=create_sales_chart(pink_morsel_df),
+                        figure=initial_figure,
                         config={'displayModeBar': True, 'displaylogo': False},
                         style={'height': '600px'}
-                    )
+                    ),
+                    # Polls for a new data version; the chart redraws only when it changes
+                    dcc.Interval(id='data_refresh', interval=REFRESH_INTERVAL_MS),
+                    dcc.Store(id='data_version', data=dataset.version),
+                    # Per-region series for clientside region switching
+                    dcc.Store(id='region_series')
                 ]
             ),
             
@@ -271,17 +552,178 @@ def create_app():
         ]
     )
     
-    # Callback to update the chart based on region
+    if METRICS.enabled:
+        METRICS.observe('stage_seconds', time.perf_counter() - layout_started, stage='layout')
+
+    # Tell the browser when the server has swapped in new data
+    @app.callback(
+        Output('data_version', 'data'),
+        Input('data_refresh', 'n_intervals'),
+        State('data_version', 'data')
+    )
+    @instrument_callback('check_data_version')
+    def check_data_version(n_intervals, known_version):
+        version = dataset.version
+        return no_update if version == known_version else version
+
+    # Offer products added by later ingestion runs without a restart
+    @app.callback(
+        Output('product_selector', 'options'),
+        Input('data_refresh', 'n_intervals'),
+        State('product_selector', 'options')
+    )
+    @instrument_callback('check_products')
+    def check_products(n_intervals, known_options):
+        options = product_options()
+        return no_update if options == known_options else options
+
+    # Callback to update the chart based on region, resolution, zoom and data version;
+    # in clientside mode the region is only read, since the browser handles its changes
     @app.callback(
         Output('sales_graph', 'figure'),
-        Input('region_selector', 'value')
+        Input('resolution_selector', 'value'),
+        Input('sales_graph', 'relayoutData'),
+        Input('data_version', 'data'),
+        Input('product_selector', 'value'),
+        (State if clientside else Input)('region_selector', 'value')
     )
-    def update_chart(selected_region):
-        return create_sales_chart(pink_morsel_df, selected_region)
+    @instrument_callback('update_chart')
+    def update_chart(resolution, relayout_data, version, product, selected_region):
+        # Zoom only matters for aggregated views, and only when it triggered the update
+        x_range = None
+        triggered = [trigger['prop_id'] for trigger in callback_context.triggered]
+        if resolution != 'raw' and 'sales_graph.relayoutData' in triggered:
+            x_range = zoom_range(relayout_data)
+        if triggered == ['sales_graph.relayoutData']:
+            # A pan or zoom alone only needs a new figure when an aggregated view is
+            # re-bucketed for the new range or restored in full on autoscale
+            if resolution == 'raw' or (x_range is None and not (relayout_data or {}).get('xaxis.autorange')):
+                return no_update
+        return json.loads(figure_json(selected_region, resolution, x_range, product))
+
+    # Summarize the price increase's effect on the selected product and region;
+    # in clientside mode the browser picks the text for region changes
+    @app.callback(
+        Output('impact_summary', 'children'),
+        (State if clientside else Input)('region_selector', 'value'),
+        Input('product_selector', 'value'),
+        Input('data_version', 'data')
+    )
+    @instrument_callback('update_impact_summary')
+    def update_impact_summary(selected_region, product, version):
+        return price_impact.summary_text(impact_report(product), selected_region)
+
+    if clientside:
+        app.clientside_callback(
+            ClientsideFunction(namespace='sales', function_name='loadSeries'),
+            Output('region_series', 'data'),
+            Input('product_selector', 'value'),
+            Input('data_version', 'data')
+        )
+        app.clientside_callback(
+            ClientsideFunction(namespace='sales', function_name='switchRegion'),
+            Output('sales_graph', 'figure', allow_duplicate=True),
+            Input('region_selector', 'value'),
+            State('region_series', 'data'),
+            State('sales_graph', 'figure'),
+            State('resolution_selector', 'value'),
+            State('product_selector', 'value'),
+            prevent_initial_call=True
+        )
+        app.clientside_callback(
+            ClientsideFunction(namespace='sales', function_name='switchSummary'),
+            Output('impact_summary', 'children', allow_duplicate=True),
+            Input('region_selector', 'value'),
+            State('region_series', 'data'),
+            State('product_selector', 'value'),
+            prevent_initial_call=True
+        )
+
+    # Compact per-region series, gzip-compressed and revalidated by ETag
+    @app.server.route('/series.json')
+    def serve_series():
+        product = request.args.get('product', PRODUCT)
+        if product not in product_names():
+            abort(404)
+        version, index = product_data(product)
+        etag = hashlib.sha1(f'{product}:{version}'.encode()).hexdigest()
+        if etag in request.if_none_match:
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+        def build():
+            payload = region_series(index, product, impact_report(product))
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            return body, gzip.compress(body)
+
+        body, compressed = figure_cache.get_or_build(('series', product, version), build)
+        response = Response(body, mimetype='application/json')
+        if 'gzip' in request.accept_encodings:
+            response.set_data(compressed)
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        response.set_etag(etag)
+        return response
+
+    # Cached figure JSON, served as-is without rebuilding or re-encoding
+    @app.server.route('/figures/<region>.json')
+    def serve_figure(region):
+        resolution = request.args.get('resolution', 'raw')
+        product = request.args.get('product', PRODUCT)
+        if product not in product_names() or resolution not in RESOLUTIONS:
+            abort(404)
+        if region != 'all' and region not in product_data(product)[1].regions:
+            abort(404)
+        return Response(figure_json(region, resolution, None, product), mimetype='application/json')
+
+    # Before/after price increase stats per region and in total
+    @app.server.route('/api/price-impact')
+    def serve_price_impact():
+        product = request.args.get('product', PRODUCT)
+        if product not in product_names():
+            abort(404)
+        return jsonify(impact_report(product))
+
+    # Precompressed snapshot artifacts; names are content-hashed so they never change
+    if snapshot is not None:
+        @app.server.route('/snapshot/<path:name>')
+        def serve_snapshot(name):
+            if name == static_snapshot.MANIFEST_FILE_NAME:
+                abort(404)
+            path, encoding = static_snapshot.resolve(precomputed, name, request.accept_encodings)
+            if path is None or not os.path.isfile(path):
+                abort(404)
+            response = send_file(path, mimetype=mimetypes.guess_type(name)[0])
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.headers['Vary'] = 'Accept-Encoding'
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return response
+
+    # Liveness and readiness probes; the data is loaded by now, figures may not be
+    @app.server.route('/healthz')
+    def healthz():
+        return jsonify({'status': 'ok'})
+
+    @app.server.route('/readyz')
+    def readyz():
+        return jsonify({'ready': True, 'data_version': dataset.version, 'figures_cached': figure_cache.stats()['entries']})
+
+    # Figure cache counters for scraping
+    @app.server.route('/cache/stats')
+    def cache_stats():
+        return jsonify(figure_cache.stats())
+
+    # Prometheus-style stage timings, enabled with SALES_METRICS=1
+    if METRICS.enabled:
+        @app.server.route('/metrics')
+        def metrics():
+            return Response(METRICS.render(cache_counters()), mimetype='text/plain; version=0.0.4')
     
     return app
 
 # Run the app
 if __name__ == "__main__":
     app = create_app()
+    app.warm_up()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,53 @@
+// Clientside callbacks for the sales dashboard. Region switching redraws the
+// chart and picks the price impact summary in the browser from the per-region
+// series fetched once from /series.json; views it cannot draw locally are
+// fetched from the server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    sales: {
+        // Fetch the compact per-region series; the browser revalidates it by ETag
+        loadSeries: function (product, version) {
+            const query = new URLSearchParams({product: product, version: version || ''});
+            return fetch('/series.json?' + query, {cache: 'no-cache'})
+                .then(function (response) { return response.json(); });
+        },
+
+        // Swap the trace for the selected region without a server round trip
+        switchRegion: function (region, series, figure, resolution, product) {
+            const regionSeries = series && series.product === product && series.regions[region];
+            if (resolution !== 'raw' || !regionSeries || !figure || !figure.data || !figure.data.length) {
+                // Fall back to the server's cached figure for views we can't build here,
+                // including the empty figure a fast start serves before the first build
+                const query = new URLSearchParams({product: product, resolution: resolution});
+                return fetch('/figures/' + encodeURIComponent(region) + '.json?' + query)
+                    .then(function (response) { return response.json(); });
+            }
+
+            const start = Date.parse(series.start);
+            const dates = regionSeries.days.map(function (day) {
+                return new Date(start + day * 86400000).toISOString().slice(0, 10);
+            });
+            const display = region === 'all' ? 'All Regions' : region.charAt(0).toUpperCase() + region.slice(1);
+
+            const updated = JSON.parse(JSON.stringify(figure));
+            updated.data[0].x = dates;
+            updated.data[0].y = regionSeries.sales;
+            updated.layout.title.text = updated.layout.title.text.replace(/ - [^-]*$/, ' - ' + display);
+            updated.layout.annotations[0].y = regionSeries.max;
+            updated.layout.uirevision = region + '-' + resolution;
+            return updated;
+        },
+
+        // Pick the region's price impact summary shipped with the series
+        switchSummary: function (region, series, product) {
+            const pick = function (loaded) {
+                const regionSeries = loaded.regions[region];
+                return regionSeries ? regionSeries.summary : window.dash_clientside.no_update;
+            };
+            if (series && series.product === product) {
+                return pick(series);
+            }
+            // The series for this product haven't arrived yet; fetch them now
+            return window.dash_clientside.sales.loadSeries(product, '').then(pick);
+        }
+    }
+});
@@ -0,0 +1,261 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+import app as app_module
+import single_formatted_output
+
+DATA_DIRECTORY = single_formatted_output.DATA_DIRECTORY
+SCALES = [1, 10, 100, 1000]
+REGIONS = ['all', 'north', 'east', 'south', 'west']
+STAGES = ['ingest', 'load_data_store', 'load_data_csv', 'memory', 'create_app', 'chart']
+
+# Callback timings repeat this many times per region to get stable percentiles
+CHART_REPEATS = 20
+# Seconds between checks that a stage's process is still alive
+POLL_INTERVAL = 1.0
+
+
+def generate_data(data_directory, scale, template_directory=DATA_DIRECTORY):
+    """Write `scale` copies of the shipped daily sales files, each shifted later in time
+
+    Returns the number of input rows written.
+    """
+    os.makedirs(data_directory, exist_ok=True)
+    templates = []
+    for file_name in sorted(os.listdir(template_directory)):
+        template = pd.read_csv(os.path.join(template_directory, file_name), dtype=str)
+        templates.append((file_name, template, pd.to_datetime(template['date'])))
+    span = max(dates.max() for _, _, dates in templates) - min(dates.min() for _, _, dates in templates)
+    span += pd.Timedelta(days=1)
+
+    rows = 0
+    for copy in range(scale):
+        for file_name, template, dates in templates:
+            shifted = template.assign(date=(dates + span * copy).dt.strftime('%Y-%m-%d'))
+            name, extension = os.path.splitext(file_name)
+            shifted.to_csv(os.path.join(data_directory, f"{name}_{copy}{extension}"), index=False)
+            rows += len(shifted)
+    return rows
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its children, in MiB"""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is bytes on macOS and KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentiles(samples):
+    """Return p50/p99 of a list of seconds, in milliseconds"""
+    samples = np.asarray(samples) * 1000
+    return {'p50_ms': float(np.percentile(samples, 50)), 'p99_ms': float(np.percentile(samples, 99))}
+
+
+def run_stage(stage, workdir, repeats=CHART_REPEATS):
+    """Time one stage against the data in workdir, returning its measurements"""
+    data_directory = os.path.join(workdir, 'data')
+    csv_path = os.path.join(workdir, 'formatted_data.csv')
+    app_module.FILE_PATH = csv_path
+    app_module.STORE_PATH = app_module.columnar_store.store_path_for(csv_path)
+
+    if stage == 'ingest':
+        start = time.perf_counter()
+        # Synthetic copies are shifted far into the future, so skip the date range check
+        rows = single_formatted_output.format_sales_data(data_directory, csv_path, date_range=None)
+        return {'seconds': time.perf_counter() - start, 'rows': rows}
+
+    if stage in ('load_data_store', 'load_data_csv'):
+        if stage == 'load_data_csv':
+            app_module.STORE_PATH = os.path.join(workdir, 'missing.columns')
+        start = time.perf_counter()
+        rows = len(app_module.load_data())
+        return {'seconds': time.perf_counter() - start, 'rows': rows}
+
+    if stage == 'memory':
+        # What a worker holds: the DataFrame the loader used to parse versus the compact columns
+        frame = pd.read_csv(csv_path)
+        frame['date'] = pd.to_datetime(frame['date'])
+        frame_bytes = int(frame.memory_usage(deep=True).sum())
+        del frame
+        index = app_module.RegionIndex(app_module.load_data())
+        return {
+            'dataset_rows': len(index.dataset),
+            'frame_bytes': frame_bytes,
+            'compact_bytes': index.dataset.nbytes,
+            'index_bytes': index.dataset.nbytes + index.by_region.nbytes,
+        }
+
+    if stage == 'create_app':
+        start = time.perf_counter()
+        app_module.create_app(watch_interval=None)
+        return {'seconds': time.perf_counter() - start}
+
+    if stage == 'chart':
+        index = app_module.RegionIndex(app_module.load_data())
+        regions = {}
+        for region in REGIONS:
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                app_module.create_sales_chart(index, region)
+                samples.append(time.perf_counter() - start)
+            regions[region] = percentiles(samples)
+        return {'regions': regions}
+
+    raise ValueError(f"Unknown stage: {stage!r}")
+
+
+def _stage_process(stage, workdir, repeats, results):
+    """Child process entry point so every stage starts cold with its own peak RSS"""
+    try:
+        result = run_stage(stage, workdir, repeats)
+    except Exception as error:
+        traceback.print_exc()
+        results.put({'error': f"{type(error).__name__}: {error}"})
+        return
+    result['peak_rss_mb'] = peak_rss_mb()
+    results.put(result)
+
+
+def run_isolated(stage, workdir, repeats=CHART_REPEATS, timeout=None):
+    """Run a stage in a fresh process and return its measurements
+
+    A stage that raises, dies without reporting or runs longer than timeout
+    seconds returns {'error': reason} instead.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_stage_process, args=(stage, workdir, repeats, results))
+    process.start()
+    started = time.monotonic()
+    while True:
+        exited = process.exitcode is not None
+        try:
+            # Once the process has exited, anything it reported is already queued
+            result = results.get(timeout=0.1 if exited else POLL_INTERVAL)
+            break
+        except queue.Empty:
+            if exited:
+                result = {'error': f"stage process exited with code {process.exitcode}"}
+                break
+            if timeout is not None and time.monotonic() - started > timeout:
+                process.terminate()
+                result = {'error': f"timed out after {timeout:g} seconds"}
+                break
+    process.join()
+    return result
+
+
+def run_benchmark(scales=SCALES, stages=STAGES, repeats=CHART_REPEATS, workdir=None, timeout=None):
+    """Benchmark every stage at every scale, returning a JSON-serializable report
+
+    Stages that fail are reported with an 'error' instead of measurements.
+    """
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory(dir=workdir) as root:
+        for scale in scales:
+            scale_directory = os.path.join(root, f"scale_{scale}")
+            input_rows = generate_data(os.path.join(scale_directory, 'data'), scale)
+            results = {}
+            for stage in stages:
+                results[stage] = run_isolated(stage, scale_directory, repeats, timeout)
+                if 'rows' in results[stage]:
+                    rows = input_rows if stage == 'ingest' else results[stage]['rows']
+                    results[stage]['rows_per_second'] = rows / results[stage]['seconds']
+            report['results'].append({'scale': scale, 'input_rows': input_rows, 'stages': results})
+    return report
+
+
+def find_failures(report):
+    """List the stages that failed in report"""
+    return [
+        f"scale {result['scale']} {stage}: {measurements['error']}"
+        for result in report['results']
+        for stage, measurements in result['stages'].items()
+        if 'error' in measurements
+    ]
+
+
+def find_regressions(report, baseline, tolerance):
+    """List timings in report that are more than `tolerance` slower than baseline"""
+    def timings(results):
+        flat = {}
+        for result in results['results']:
+            for stage, measurements in result['stages'].items():
+                if 'seconds' in measurements:
+                    flat[(result['scale'], stage)] = measurements['seconds']
+                for region, latency in measurements.get('regions', {}).items():
+                    flat[(result['scale'], f"chart[{region}]")] = latency['p50_ms']
+        return flat
+
+    current, previous = timings(report), timings(baseline)
+    return [
+        f"scale {scale} {stage}: {previous[(scale, stage)]:.4g} -> {value:.4g}"
+        for (scale, stage), value in current.items()
+        if (scale, stage) in previous and value > previous[(scale, stage)] * (1 + tolerance)
+    ]
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, loading and chart callbacks")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)),
+                        help="comma-separated multiples of the shipped data size")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument("--repeats", type=int, default=CHART_REPEATS, help="chart timings per region")
+    parser.add_argument("--workdir", default=None, help="where to generate synthetic data")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per stage")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown versus the baseline before failing")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        [int(scale) for scale in args.scales.split(",")],
+        args.stages.split(","),
+        args.repeats,
+        args.workdir,
+        args.timeout,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, mode="w") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+    failures = find_failures(report)
+    for failure in failures:
+        print(f"Failed: {failure}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, mode="r") as baseline_file:
+            regressions = find_regressions(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if failures or regressions else 0
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
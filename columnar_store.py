@@ -0,0 +1,122 @@
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from compact_dataset import CompactDataset
+
+# The store is a directory of .npy columns plus a meta.json that names the current
+# generation of column files. Columns are memory-mapped read-only, so every process
+# that opens the store shares the same page-cache pages instead of parsing its own copy.
+# They are a CompactDataset's columns: sales, int32 day offsets from meta["start"] and
+# int8 codes into the lowercase meta["regions"], in date order and again grouped by
+# region, so no process has to build a private region-major copy.
+META_FILE_NAME = "meta.json"
+COLUMNS = ["sales", "days", "region"]
+REGION_MAJOR_PREFIX = "by_region_"
+
+
+def store_path_for(csv_path):
+    """Return the columnar store directory that sits next to a formatted CSV"""
+    return os.path.splitext(csv_path)[0] + ".columns"
+
+
+def source_signature(csv_path):
+    """Return the size and mtime used to decide whether a store is fresh"""
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_store(csv_path, store_path=None):
+    """Convert a formatted sales CSV into a date-sorted columnar store"""
+    store_path = store_path or store_path_for(csv_path)
+    os.makedirs(store_path, exist_ok=True)
+    signature = source_signature(csv_path)
+
+    df = pd.read_csv(csv_path, dtype={"sales": np.float64, "date": str, "region": str})
+    dataset = CompactDataset.from_frame(df)
+
+    # New generations get fresh file names so readers holding the old maps are unaffected
+    generation = uuid.uuid4().hex
+    by_region = dataset.group_by_region()
+    columns = {"sales": dataset.sales, "days": dataset.days, "region": dataset.region_codes}
+    columns.update({
+        REGION_MAJOR_PREFIX + "sales": by_region.sales,
+        REGION_MAJOR_PREFIX + "days": by_region.days,
+        REGION_MAJOR_PREFIX + "region": by_region.region_codes,
+    })
+    files = {}
+    for name, values in columns.items():
+        files[name] = f"{name}-{generation}.npy"
+        np.save(os.path.join(store_path, files[name]), values)
+
+    meta = {
+        "rows": len(df),
+        "regions": dataset.regions,
+        "start": str(dataset.start),
+        "files": files,
+        "source": signature,
+    }
+    previous = read_meta(store_path)
+    meta_path = os.path.join(store_path, META_FILE_NAME)
+    with open(meta_path + ".tmp", mode="w") as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Unlinking is safe for readers that already mapped the old generation
+    if previous:
+        for file_name in previous["files"].values():
+            old_path = os.path.join(store_path, file_name)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+    return meta
+
+
+def read_meta(store_path):
+    """Return the store's metadata, or None when there is no store"""
+    meta_path = os.path.join(store_path, META_FILE_NAME)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, mode="r") as meta_file:
+        return json.load(meta_file)
+
+
+def is_fresh(meta, csv_path):
+    """Check that a store was built from the CSV as it currently is on disk"""
+    # Stores written before the compact, two-layout format have no start date or by_region_ files
+    if meta is None or "start" not in meta or REGION_MAJOR_PREFIX + "sales" not in meta["files"]:
+        return False
+    if csv_path is None or not os.path.exists(csv_path):
+        return True
+    return meta["source"] == source_signature(csv_path)
+
+
+def ensure_store(csv_path, store_path=None):
+    """Write the store if it is missing or stale, so pre-forked workers all map the same columns"""
+    store_path = store_path or store_path_for(csv_path)
+    if os.path.exists(csv_path) and not is_fresh(read_meta(store_path), csv_path):
+        write_store(csv_path, store_path)
+
+
+def read_store(store_path, csv_path=None):
+    """Load the store as a CompactDataset backed by memory-mapped columns
+
+    Returns None when the store is missing, stale relative to ``csv_path``, or
+    was swapped out mid-read, so callers can fall back to the CSV.
+    """
+    meta = read_meta(store_path)
+    if not is_fresh(meta, csv_path):
+        return None
+    try:
+        columns = {
+            name: np.load(os.path.join(store_path, file_name), mmap_mode="r")
+            for name, file_name in meta["files"].items()
+        }
+    except FileNotFoundError:
+        return None
+    by_region = CompactDataset(
+        *(columns[REGION_MAJOR_PREFIX + name] for name in COLUMNS), meta["regions"], meta["start"]
+    )
+    return CompactDataset(*(columns[name] for name in COLUMNS), meta["regions"], meta["start"], by_region)
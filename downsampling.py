@@ -0,0 +1,84 @@
+import numpy as np
+
+from region_index import PRICE_INCREASE_DATE
+
+# Number of points the 'auto' resolution decimates a view down to
+LTTB_TARGET_POINTS = 500
+
+
+def bucket_starts(dates, frequency):
+    """Return the start of the daily ('D'), weekly ('W') or monthly ('M') bucket of each date
+
+    Buckets never straddle the price increase: a bucket containing it is split so
+    totals before and after the increase stay separate.
+    """
+    days = dates.astype('datetime64[D]')
+    if frequency == 'D':
+        starts = days
+    elif frequency == 'W':
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        day_numbers = days.astype(np.int64)
+        starts = (day_numbers - (day_numbers + 3) % 7).astype('datetime64[D]')
+    elif frequency == 'M':
+        starts = days.astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        raise ValueError(f"Unknown frequency: {frequency!r}")
+
+    increase = PRICE_INCREASE_DATE.to_datetime64().astype('datetime64[D]')
+    starts = np.where((days >= increase) & (starts < increase), increase, starts)
+    return starts.astype('datetime64[ns]')
+
+
+def aggregate(dates, sales, frequency):
+    """Total sales per bucket, returning (bucket start dates, totals)"""
+    buckets, positions = np.unique(bucket_starts(dates, frequency), return_inverse=True)
+    totals = np.bincount(positions, weights=sales, minlength=len(buckets))
+    return buckets, totals
+
+
+def lttb(x, y, threshold=LTTB_TARGET_POINTS):
+    """Largest-triangle-three-buckets decimation, returning the indices to keep
+
+    The first and last points are always kept; every other bucket contributes
+    the real point that forms the largest triangle with its neighbours, so the
+    shape of the series and the values shown on hover are preserved.
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else length
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(dates, sales, resolution):
+    """Reduce a date-sorted series for display at the given resolution
+
+    'daily', 'weekly' and 'monthly' return bucket totals; 'auto' totals by day
+    and then decimates with LTTB. Returns (dates, sales).
+    """
+    if resolution == 'auto':
+        dates, sales = aggregate(dates, sales, 'D')
+        keep = lttb(dates.astype(np.int64), sales)
+        return dates[keep], sales[keep]
+    frequency = {'daily': 'D', 'weekly': 'W', 'monthly': 'M'}[resolution]
+    return aggregate(dates, sales, frequency)
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """Thread-safe, size-bounded LRU cache of serialized figures
+
+    Keys are typically (region, data version) tuples; values are whatever the
+    build function returns, usually the figure's JSON text. Hit, miss and
+    eviction counters are kept for scraping.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, build):
+        """Return the cached value for key, building and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Build outside the lock so one slow figure doesn't block cache hits
+        value = build()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Drop every cached entry, keeping the counters"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the cache counters as a dict"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
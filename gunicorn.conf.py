@@ -0,0 +1,23 @@
+import multiprocessing
+import os
+
+from live_data import WATCH_INTERVAL
+
+# gunicorn -c gunicorn.conf.py (or python serve.py)
+wsgi_app = "wsgi:server"
+bind = os.environ.get("SALES_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("SALES_WORKERS", multiprocessing.cpu_count()))
+# Threads per worker, so slow figure builds don't block cache hits
+worker_class = "gthread"
+threads = int(os.environ.get("SALES_THREADS", 4))
+# On SIGTERM, workers stop accepting and finish in-flight requests for up to this many seconds
+graceful_timeout = int(os.environ.get("SALES_GRACEFUL_TIMEOUT", 30))
+# Load the app and data in the master before forking workers
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Start each worker's data watcher and warm its default figure"""
+    from wsgi import app
+    app.dataset.start(WATCH_INTERVAL)
+    app.warm_up()
@@ -0,0 +1,296 @@
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import random
+import threading
+import time
+
+# Instrumentation is opt-in: SALES_METRICS=1 records timings and serves /metrics.
+# SALES_PROFILE=cprofile|pyinstrument additionally profiles a sample of callbacks,
+# SALES_PROFILE_RATE of them (default 1%), writing reports into SALES_PROFILE_DIR.
+METRICS_ENV = "SALES_METRICS"
+PROFILE_ENV = "SALES_PROFILE"
+PROFILE_RATE_ENV = "SALES_PROFILE_RATE"
+PROFILE_DIR_ENV = "SALES_PROFILE_DIR"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds between writes of a worker's metrics to the shared directory
+SHARE_INTERVAL = 5.0
+
+_DISABLED = contextlib.nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record one observation"""
+        self.count += 1
+        self.sum += value
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+
+
+class Metrics:
+    """Registry of timing histograms and counters rendered as Prometheus text
+
+    When disabled every timer is a shared no-op context manager, so the
+    instrumented code paths pay next to nothing. After share(), every process
+    using the registry (such as pre-forked workers) writes its metrics to a
+    shared directory and render() reports the totals over all of them.
+    """
+
+    def __init__(self, enabled=False, prefix="sales_app"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._share_directory = None
+        self._share_extra = None
+        self._share_interval = SHARE_INTERVAL
+        self._share_path = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in the named histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        self._start_sharing()
+        with self._lock:
+            self._histograms.setdefault(key, Histogram()).observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        """Add to the named counter"""
+        key = (name, tuple(sorted(labels.items())))
+        self._start_sharing()
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def share(self, directory, extra_counters=None, interval=SHARE_INTERVAL):
+        """Aggregate over every process sharing directory
+
+        Each process writes its own file there every interval seconds, with the
+        counters returned by extra_counters; files of exited processes are kept
+        so totals never go backwards. Call before forking.
+        """
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._share_directory = directory
+        self._share_extra = extra_counters
+        self._share_interval = interval
+        self._share_path = None
+
+    def _after_fork(self):
+        """Give a forked child its own lock and, when shared, its own empty metrics"""
+        self._lock = threading.Lock()
+        if self._share_directory is not None:
+            # The parent keeps reporting what it recorded before the fork
+            self._histograms, self._counters = {}, {}
+            self._share_path = None
+
+    def _start_sharing(self):
+        """Start this process's writer thread on first use; threads don't survive a fork"""
+        if self._share_directory is None or self._share_path is not None:
+            return
+        with self._lock:
+            if self._share_path is not None:
+                return
+            self._share_path = os.path.join(self._share_directory, f"metrics-{os.getpid()}-{time.time_ns()}.json")
+        threading.Thread(target=self._share_forever, daemon=True).start()
+
+    def _share_forever(self):
+        """Write this process's metrics periodically"""
+        while True:
+            time.sleep(self._share_interval)
+            try:
+                self.flush()
+            except OSError:
+                continue
+
+    def flush(self, extra_counters=None):
+        """Write this process's metrics to the shared directory now"""
+        self._start_sharing()
+        if self._share_path is None:
+            return
+        if extra_counters is None and self._share_extra is not None:
+            extra_counters = self._share_extra()
+        counters, histograms = self._snapshot(extra_counters)
+        state = {
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+            "histograms": [[name, labels, *values] for (name, labels), values in histograms.items()],
+        }
+        with open(self._share_path + ".tmp", mode="w") as share_file:
+            json.dump(state, share_file)
+        os.replace(self._share_path + ".tmp", self._share_path)
+
+    def _snapshot(self, extra_counters=None):
+        """Return copies of this process's (counters, histograms)"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h.buckets, list(h.counts), h.count, h.sum)
+                          for key, h in self._histograms.items()}
+        for name, value in (extra_counters or {}).items():
+            counters[(name, ())] = value
+        return counters, histograms
+
+    def _shared_snapshot(self, extra_counters):
+        """Return (counters, histograms) summed over every process's shared file"""
+        self.flush(extra_counters)
+        counters, histograms = {}, {}
+        for file_name in sorted(os.listdir(self._share_directory)):
+            if not (file_name.startswith("metrics-") and file_name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self._share_directory, file_name), mode="r") as share_file:
+                    state = json.load(share_file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in state["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, counts, count, total in state["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                if key in histograms:
+                    _, summed, summed_count, summed_total = histograms[key]
+                    counts = [a + b for a, b in zip(summed, counts)]
+                    count, total = count + summed_count, total + summed_total
+                histograms[key] = (tuple(buckets), counts, count, total)
+        return counters, histograms
+
+    @contextlib.contextmanager
+    def _timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timer(self, name, **labels):
+        """Context manager timing its body into the named histogram"""
+        if not self.enabled:
+            return _DISABLED
+        return self._timer(name, labels)
+
+    def stage(self, stage):
+        """Time one stage of a callback or of startup"""
+        return self.timer("stage_seconds", stage=stage)
+
+    def render(self, extra_counters=None):
+        """Return every metric in the Prometheus text exposition format
+
+        extra_counters are this process's own; when shared, every process's are summed.
+        """
+        lines = []
+        if self._share_directory is not None:
+            counters, histograms = self._shared_snapshot(extra_counters)
+        else:
+            counters, histograms = self._snapshot(extra_counters)
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {self.prefix}_{name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{self.prefix}_{name}{_format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {self.prefix}_{name} histogram")
+            for (metric, labels), (buckets, counts, count, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(buckets, counts):
+                    bucket_labels = labels + (("le", repr(bound)),)
+                    lines.append(f"{self.prefix}_{name}_bucket{_format_labels(bucket_labels)} {bucket_count}")
+                lines.append(f"{self.prefix}_{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.prefix}_{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.prefix}_{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    """Format label pairs as {name="value",...}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Profiler:
+    """Samples callbacks with cProfile or pyinstrument and writes one report per sample"""
+
+    def __init__(self, mode=None, rate=0.01, directory="profiles"):
+        self.mode = mode
+        self.rate = rate
+        self.directory = directory
+        # Only one profile runs at a time; concurrent samples are skipped
+        self._lock = threading.Lock()
+        if mode == "pyinstrument":
+            import pyinstrument  # noqa: F401  # optional; fail at startup rather than mid-request
+        elif mode not in (None, "cprofile"):
+            raise ValueError(f"Unknown profile mode: {mode!r}")
+
+    @contextlib.contextmanager
+    def _profile(self, name):
+        path = os.path.join(self.directory, f"{name}-{time.time_ns()}")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if self.mode == "cprofile":
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    profile.dump_stats(path + ".prof")
+            else:
+                from pyinstrument import Profiler as SamplingProfiler
+                profile = SamplingProfiler()
+                profile.start()
+                try:
+                    yield
+                finally:
+                    profile.stop()
+                    with open(path + ".html", mode="w") as report:
+                        report.write(profile.output_html())
+        finally:
+            self._lock.release()
+
+    def sample(self, name):
+        """Context manager that profiles its body for a random sample of calls"""
+        if self.mode is None or random.random() >= self.rate:
+            return _DISABLED
+        if not self._lock.acquire(blocking=False):
+            return _DISABLED
+        return self._profile(name)
+
+
+METRICS = Metrics(enabled=os.environ.get(METRICS_ENV) == "1")
+PROFILER = Profiler(
+    os.environ.get(PROFILE_ENV) or None,
+    float(os.environ.get(PROFILE_RATE_ENV, "0.01")),
+    os.environ.get(PROFILE_DIR_ENV, "profiles"),
+)
+
+
+def instrument_callback(name):
+    """Decorator recording a callback's total time and errors, and optionally profiling it"""
+    def decorator(callback):
+        @functools.wraps(callback)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer("callback_seconds", callback=name), PROFILER.sample(name):
+                try:
+                    return callback(*args, **kwargs)
+                except Exception:
+                    if METRICS.enabled:
+                        METRICS.increment("callback_errors_total", callback=name)
+                    raise
+        return wrapper
+    return decorator
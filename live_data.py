@@ -0,0 +1,68 @@
+import logging
+import threading
+
+# Seconds between checks of the data files
+WATCH_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class LiveDataset:
+    """Holds the current (version, dataset) snapshot and hot-swaps it on change
+
+    ``load`` builds a new dataset and ``get_version`` returns a cheap token that
+    changes when the underlying files do. Readers take ``current`` once per
+    request; a reload replaces the whole tuple in one assignment, so requests
+    already in flight keep using the snapshot they started with.
+    """
+
+    def __init__(self, load, get_version, on_swap=None):
+        self._load = load
+        self._get_version = get_version
+        self._on_swap = on_swap
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        version = get_version()
+        self.current = (version, load())
+
+    @property
+    def version(self):
+        """Version token of the current snapshot"""
+        return self.current[0]
+
+    def refresh(self):
+        """Reload and swap in the dataset if its files changed; returns True on a swap"""
+        with self._refresh_lock:
+            version = self._get_version()
+            if version == self.current[0]:
+                return False
+            self.current = (version, self._load())
+        if self._on_swap is not None:
+            self._on_swap(version)
+        return True
+
+    def _watch(self, interval):
+        """Poll for changes until stopped"""
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                # A file caught mid-write, or a bad one, is retried on the next poll;
+                # the watcher must outlive any single failed load
+                logger.exception("Reloading the dataset failed; keeping the current one")
+                continue
+
+    def start(self, interval=WATCH_INTERVAL):
+        """Start watching in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,178 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Dashboard requests replayed round-robin by every client: cached figures at each
+# resolution, the clientside series and the price impact stats
+PATHS = [
+    '/figures/all.json',
+    '/figures/north.json?resolution=weekly',
+    '/figures/south.json?resolution=auto',
+    '/figures/east.json',
+    '/series.json',
+    '/api/price-impact',
+]
+WORKER_COUNTS = [1, 2, 4]
+DURATION_SECONDS = 10.0
+# Seconds to wait for a started server to answer /readyz
+STARTUP_TIMEOUT = 60.0
+
+
+def _client(base_url, paths, duration, offset, results):
+    """Client process entry point: replay paths over one keep-alive connection until the deadline"""
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    latencies = []
+    errors = 0
+    position = offset
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        path = paths[position % len(paths)]
+        position += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    results.put((latencies, errors))
+
+
+def run_load(base_url, clients, duration=DURATION_SECONDS, paths=PATHS):
+    """Drive a server with concurrent client processes and return throughput and latency"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [
+        context.Process(target=_client, args=(base_url, paths, duration, offset, results))
+        for offset in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in processes:
+        process.join()
+
+    samples = np.asarray(latencies) * 1000
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': len(latencies) / duration,
+        'p50_ms': float(np.percentile(samples, 50)) if len(samples) else None,
+        'p99_ms': float(np.percentile(samples, 99)) if len(samples) else None,
+    }
+
+
+def free_port():
+    """Return a local port that is currently free"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_ready(base_url, timeout=STARTUP_TIMEOUT):
+    """Poll /readyz until the server answers"""
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+        try:
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.2)
+    raise TimeoutError(f"Server at {base_url} not ready after {timeout}s")
+
+
+def start_server(workers, port):
+    """Start serve.py with some workers on a local port, returning the process"""
+    return subprocess.Popen(
+        [sys.executable, 'serve.py', '--workers', str(workers), '--bind', f'127.0.0.1:{port}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def run_scaling(worker_counts=WORKER_COUNTS, clients=None, duration=DURATION_SECONDS, paths=PATHS):
+    """Load-test a fresh local server at each worker count, returning a JSON-serializable report"""
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': [],
+    }
+    for workers in worker_counts:
+        port = free_port()
+        server = start_server(workers, port)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            wait_ready(base_url)
+            # One pass first so every view is built and shared before timing
+            run_load(base_url, 1, 0.5, paths)
+            result = run_load(base_url, clients or 2 * max(worker_counts), duration, paths)
+        finally:
+            server.terminate()
+            server.wait()
+        result['workers'] = workers
+        report['results'].append(result)
+
+    baseline = report['results'][0]['requests_per_second']
+    for result in report['results']:
+        result['speedup'] = result['requests_per_second'] / baseline if baseline else None
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Measure dashboard throughput as worker processes are added")
+    parser.add_argument("--workers", default=",".join(map(str, WORKER_COUNTS)),
+                        help="comma-separated worker counts to start serve.py with")
+    parser.add_argument("--clients", type=int, default=None,
+                        help="concurrent client processes (default: twice the largest worker count)")
+    parser.add_argument("--duration", type=float, default=DURATION_SECONDS, help="seconds of load per run")
+    parser.add_argument("--url", default=None, help="load-test an already running server instead")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        report = run_load(args.url.rstrip('/'), args.clients or 8, args.duration)
+    else:
+        report = run_scaling([int(count) for count in args.workers.split(",")], args.clients, args.duration)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, mode="w") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
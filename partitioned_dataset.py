@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+# Every product's formatted sales are partitioned Hive-style by product and
+# year-month: <root>/product=<slug>/month=<YYYY-MM>/<input file stem>.csv, where
+# the slug percent-encodes the product name so any name maps to one directory.
+# Each input file owns its own part in every partition it touches, so files can
+# be re-ingested or dropped independently, and readers only open the partitions
+# of the product they need.
+DATASET_DIRECTORY_NAME = "sales_dataset"
+MANIFEST_FILE_NAME = "_partitions.json"
+# Bumped when the directory layout changes, so older datasets are rebuilt
+MANIFEST_FORMAT = 2
+# Longest slug whose product= directory name fits in a 255-byte file name
+MAX_SLUG_LENGTH = 255 - len("product=")
+
+
+def dataset_path_for(csv_path):
+    """Return the partitioned dataset directory that sits next to a formatted CSV"""
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), DATASET_DIRECTORY_NAME)
+
+
+def product_slug(product):
+    """Return the directory-safe, reversible name of a product"""
+    return quote(product, safe="")
+
+
+def partition_path(root, product, month, file_path):
+    """Return the part file an input file writes for one product and month"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(root, f"product={product_slug(product)}", f"month={month}", f"{stem}.csv")
+
+
+def remove_parts(root, file_path):
+    """Delete every partition part written from an input file"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    for product_directory, month_directory in _partition_directories(root):
+        part = os.path.join(root, product_directory, month_directory, f"{stem}.csv")
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def _partition_directories(root):
+    """Yield (product=..., month=...) directory name pairs under root"""
+    if not os.path.isdir(root):
+        return
+    for product_directory in sorted(os.listdir(root)):
+        if not product_directory.startswith("product="):
+            continue
+        for month_directory in sorted(os.listdir(os.path.join(root, product_directory))):
+            if month_directory.startswith("month="):
+                yield product_directory, month_directory
+
+
+def replace_dataset(built_root, root):
+    """Swap a freshly built dataset directory into place"""
+    old_root = root + ".old"
+    shutil.rmtree(old_root, ignore_errors=True)
+    if os.path.exists(root):
+        os.rename(root, old_root)
+    os.rename(built_root, root)
+    shutil.rmtree(old_root, ignore_errors=True)
+
+
+def has_manifest(root):
+    """Check whether a dataset in the current layout has been written at root"""
+    manifest_path = os.path.join(root, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, mode="r") as manifest_file:
+        return json.load(manifest_file).get("format") == MANIFEST_FORMAT
+
+
+def write_manifest(root):
+    """Record which partitions exist, dropping empty ones; returns the manifest"""
+    products = {}
+    for product_directory, month_directory in _partition_directories(root):
+        directory = os.path.join(root, product_directory, month_directory)
+        parts = sorted(os.listdir(directory))
+        if not parts:
+            os.rmdir(directory)
+            continue
+        months = products.setdefault(unquote(product_directory.split("=", 1)[1]), {})
+        months[month_directory.split("=", 1)[1]] = parts
+
+    manifest_path = os.path.join(root, MANIFEST_FILE_NAME)
+    with open(manifest_path + ".tmp", mode="w") as manifest_file:
+        json.dump({"format": MANIFEST_FORMAT, "products": products}, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return products
+
+
+def read_manifest(root):
+    """Return {product: {month: [parts]}}, empty when there is no dataset"""
+    manifest_path = os.path.join(root, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, mode="r") as manifest_file:
+        return json.load(manifest_file)["products"]
+
+
+def manifest_version(root):
+    """Return a token that changes whenever the dataset is rewritten"""
+    manifest_path = os.path.join(root, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return ""
+    stat = os.stat(manifest_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def load_product(root, product, months=None):
+    """Load one product's sales, optionally limited to some months, sorted by date
+
+    Only that product's partitions are read, so memory follows the selected
+    view rather than the size of the whole archive.
+    """
+    partitions = read_manifest(root).get(product, {})
+    frames = []
+    for month, parts in sorted(partitions.items()):
+        if months is not None and month not in months:
+            continue
+        for part in parts:
+            frames.append(pd.read_csv(
+                os.path.join(root, f"product={product_slug(product)}", f"month={month}", part)
+            ))
+    if not frames:
+        return pd.DataFrame({"sales": pd.Series(dtype=float),
+                             "date": pd.Series(dtype="datetime64[ns]"),
+                             "region": pd.Series(dtype=str)})
+
+    df = pd.concat(frames, ignore_index=True)
+    df["date"] = pd.to_datetime(df["date"])
+    return df.sort_values("date", kind="stable")
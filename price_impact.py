@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from region_index import PRICE_INCREASE_DATE
+
+# Trailing rolling-average windows, in days, compared either side of the price increase
+ROLLING_WINDOWS = [7, 30]
+
+
+def daily_totals(dataset):
+    """Total sales per (region, day) of a CompactDataset in one grouped pass over the rows"""
+    frame = pd.DataFrame({
+        'region': dataset.region_codes,
+        'date': dataset.dates(),
+        'sales': dataset.sales.astype(np.float64),
+    })
+    daily = frame.groupby(['region', 'date'], sort=True)['sales'].sum().reset_index()
+    daily['region'] = np.asarray(dataset.regions, dtype=object)[daily['region'].to_numpy()]
+    # Every region's days summed together give the all-regions series
+    total = daily.groupby('date', sort=True)['sales'].sum().reset_index().assign(region='total')
+    return pd.concat([daily, total], ignore_index=True)
+
+
+def rolling_around(daily, days, increase):
+    """Trailing days-day rolling mean of daily sales either side of the increase
+
+    Returns {(region, after): mean}: the rolling mean on each region's last day
+    before the increase, and on its last day within the first ``days`` days
+    after it, when the region has such days.
+    """
+    rolling = daily.set_index('date').groupby('region', sort=False)['sales'].rolling(f'{days}D').mean()
+    means = {}
+    for region, series in rolling.groupby(level='region', sort=False):
+        dates = series.index.get_level_values('date').to_numpy()
+        values = series.to_numpy()
+        before = np.searchsorted(dates, increase) - 1
+        after = np.searchsorted(dates, increase + np.timedelta64(days, 'D')) - 1
+        if before >= 0:
+            means[(region, False)] = values[before]
+        if after >= 0 and dates[after] >= increase:
+            means[(region, True)] = values[after]
+    return means
+
+
+def finite(value):
+    """Return value as a float, or None for NaN, which isn't valid JSON"""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def percent_change(before, after):
+    """Percentage change from before to after, or None when undefined"""
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def impact_report(dataset):
+    """Compare a CompactDataset's sales before and after the price increase, per region and in total
+
+    Returns a JSON-serializable dict with, for each side of the increase, total
+    sales, mean daily sales, day count and the trailing 7/30-day rolling average
+    just before the increase and 7/30 days after it, plus the percent change of
+    each average.
+    """
+    daily = daily_totals(dataset)
+    increase = PRICE_INCREASE_DATE.to_datetime64()
+    daily['after'] = daily['date'].to_numpy() >= increase
+
+    periods = daily.groupby(['region', 'after'])['sales'].agg(['sum', 'mean', 'count'])
+    windows = {days: rolling_around(daily, days, increase) for days in ROLLING_WINDOWS}
+
+    report = {'price_increase_date': PRICE_INCREASE_DATE.strftime('%Y-%m-%d'), 'regions': {}}
+    for region in daily['region'].unique():
+        sides = {}
+        for after, side in [(False, 'before'), (True, 'after')]:
+            found = (region, after) in periods.index
+            stats = periods.loc[(region, after)] if found else {'sum': 0.0, 'mean': float('nan'), 'count': 0}
+            sides[side] = {
+                'total': float(stats['sum']),
+                'mean_daily': finite(stats['mean']),
+                'days': int(stats['count']),
+            }
+            for days in ROLLING_WINDOWS:
+                sides[side][f'rolling_{days}'] = finite(windows[days].get((region, after), float('nan')))
+
+        changes = {
+            measure: percent_change(sides['before'][measure], sides['after'][measure])
+            for measure in ['mean_daily'] + [f'rolling_{days}' for days in ROLLING_WINDOWS]
+        }
+        entry = {**sides, 'percent_change': changes}
+        if region == 'total':
+            report['total'] = entry
+        else:
+            report['regions'][region] = entry
+    return report
+
+
+def summary_text(report, region='all'):
+    """One-line description of the price increase's effect for the insight box"""
+    entry = report.get('total') if region == 'all' else report['regions'].get(region)
+    if entry is None or entry['percent_change']['mean_daily'] is None:
+        return "Not enough data on both sides of the price increase to compare."
+    change = entry['percent_change']['mean_daily']
+    return (
+        f"Average daily sales went from ${entry['before']['mean_daily']:,.2f} before the price increase "
+        f"to ${entry['after']['mean_daily']:,.2f} after it ({change:+.1f}%)."
+    )
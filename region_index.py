@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from compact_dataset import CompactDataset
+
+# Date of the Pink Morsel price increase marked on the chart
+PRICE_INCREASE_DATE = pd.Timestamp('2021-01-15')
+
+
+class RegionIndex:
+    """Per-region view of a date-sorted CompactDataset (or sales DataFrame)
+
+    Built once per dataset: rows are regrouped so every region occupies a
+    contiguous, still date-sorted block, and summary stats are precomputed.
+    Looking a region up is then a slice rather than a scan over every row.
+    """
+
+    def __init__(self, dataset):
+        if not isinstance(dataset, CompactDataset):
+            dataset = CompactDataset.from_frame(dataset)
+        self.dataset = dataset
+
+        self.by_region = dataset.group_by_region()
+        bounds = np.searchsorted(self.by_region.region_codes, np.arange(len(dataset.regions) + 1))
+        self.slices = {
+            region: slice(int(bounds[code]), int(bounds[code + 1]))
+            for code, region in enumerate(dataset.regions)
+            if bounds[code + 1] > bounds[code]
+        }
+
+        increase = dataset.day_offset(PRICE_INCREASE_DATE)
+        self._stats = {
+            region: self._compute_stats(self.days(region), self.by_region.sales[region_slice], increase)
+            for region, region_slice in self.slices.items()
+        }
+        self._stats['all'] = self._compute_stats(dataset.days, dataset.sales, increase)
+
+    @property
+    def regions(self):
+        """Lowercase names of the regions present in the data"""
+        return list(self.slices)
+
+    @property
+    def start(self):
+        """Date that day offsets count from"""
+        return self.dataset.start
+
+    def _rows(self, region):
+        """Return (dataset, rows) holding a region's rows"""
+        if region == 'all':
+            return self.dataset, slice(None)
+        return self.by_region, self.slices.get(region, slice(0, 0))
+
+    def frame(self, region='all'):
+        """Return the date-sorted rows for a region, or every row for 'all', as a DataFrame"""
+        dataset, rows = self._rows(region)
+        return dataset.take(rows).to_frame()
+
+    def days(self, region='all'):
+        """Return a region's day offsets from self.start"""
+        dataset, rows = self._rows(region)
+        return dataset.days[rows]
+
+    def series(self, region='all'):
+        """Return the (datetime64[D] dates, sales) NumPy arrays for a region"""
+        dataset, rows = self._rows(region)
+        return dataset.dates(rows), dataset.sales[rows]
+
+    def stats(self, region='all'):
+        """Return precomputed max, total and before/after price increase sums"""
+        if region not in self._stats:
+            return self._compute_stats(self.days(region), self.series(region)[1],
+                                       self.dataset.day_offset(PRICE_INCREASE_DATE))
+        return self._stats[region]
+
+    @staticmethod
+    def _compute_stats(days, sales, increase):
+        """Summarise one date-sorted series, accumulating in float64"""
+        split = np.searchsorted(days, increase)
+        return {
+            'rows': len(sales),
+            'max': float(sales.max()) if len(sales) else float('nan'),
+            'total': float(sales.sum(dtype=np.float64)),
+            'total_before_increase': float(sales[:split].sum(dtype=np.float64)),
+            'total_after_increase': float(sales[split:].sum(dtype=np.float64)),
+        }
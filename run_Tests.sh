@@ -88,8 +88,8 @@ if [ ! -f "app.py" ]; then
 fi
 
 # Check if test file exists
-if [ ! -f "test_dash_app.py" ]; then
-    print_red "test_dash_app.py not found in current directory"
+if [ ! -f "test_App.py" ]; then
+    print_red "test_App.py not found in current directory"
     exit 1
 fi
 
@@ -98,7 +98,7 @@ echo ""
 print_yellow "Running test suite..."
 echo "---------------------------------------------------------------"
 
-python test_dash_app.py
+python -m pytest -q
 TEST_EXIT_CODE=$?
 
 echo ""
@@ -0,0 +1,49 @@
+"""Production server: python serve.py --workers 4 --bind 0.0.0.0:8050
+
+Runs gunicorn with gunicorn.conf.py, the same as gunicorn -c gunicorn.conf.py:
+the master imports wsgi.py once, so the app and its memory-mapped dataset are
+loaded before forking, and the workers serve from one shared listening socket
+with a few threads each. Workers that die are replaced; on SIGTERM they finish
+in-flight requests before exiting. The flags override SALES_WORKERS,
+SALES_BIND and SALES_THREADS.
+"""
+import argparse
+import os
+import sys
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+
+
+def gunicorn_command(bind=None, workers=None, threads=None, access_log=False):
+    """Return the gunicorn command line for the given overrides"""
+    command = [sys.executable, "-m", "gunicorn", "--config", CONFIG_PATH,
+               "--chdir", os.path.dirname(CONFIG_PATH)]
+    if bind:
+        command += ["--bind", bind]
+    if workers:
+        command += ["--workers", str(workers)]
+    if threads:
+        command += ["--threads", str(threads)]
+    if access_log:
+        command += ["--access-logfile", "-"]
+    return command
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Serve the dashboard from several worker processes with gunicorn")
+    parser.add_argument("--bind", default=None, help="host:port to listen on")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--threads", type=int, default=None, help="request threads per worker")
+    parser.add_argument("--access-log", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if not hasattr(os, "fork"):
+        raise SystemExit("serve.py runs gunicorn, which needs os.fork; serve wsgi:server with a WSGI server instead")
+
+    command = gunicorn_command(args.bind, args.workers, args.threads, args.access_log)
+    # Replace this process, so signals sent to it reach the gunicorn master
+    os.execv(command[0], command)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
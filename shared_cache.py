@@ -0,0 +1,159 @@
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+
+from figure_cache import FigureCache
+
+# Worker processes of one server share what they build through a directory of
+# entry files, on tmpfs where available. Every key carries the data version
+# it was built from, so after a reload the first worker to need a view builds it
+# once and every other worker reads it back; entries of old versions are never
+# asked for again and age out as the oldest files are pruned.
+SHARED_DIRECTORY_BASE = '/dev/shm' if os.path.isdir('/dev/shm') else None
+ENTRY_SUFFIX = '.entry'
+
+
+def encode_entry(value):
+    """Serialize a cached value as a JSON header line and a payload, or None if unsupported
+
+    Only the values the app caches are shared: figure JSON strings, tuples of
+    bytes (a body and its compressed copy) and JSON-compatible dicts. Nothing
+    read back is ever executed, unlike unpickling.
+    """
+    if isinstance(value, str):
+        header, payload = {'type': 'str'}, value.encode()
+    elif isinstance(value, tuple) and all(isinstance(part, bytes) for part in value):
+        header, payload = {'type': 'bytes', 'lengths': [len(part) for part in value]}, b''.join(value)
+    elif isinstance(value, dict):
+        header, payload = {'type': 'json'}, json.dumps(value).encode()
+    else:
+        return None
+    return json.dumps(header).encode() + b'\n' + payload
+
+
+def decode_entry(data):
+    """Return the value of an encoded entry; raises ValueError for malformed data"""
+    header, _, payload = data.partition(b'\n')
+    header = json.loads(header)
+    if header['type'] == 'str':
+        return payload.decode()
+    if header['type'] == 'json':
+        return json.loads(payload)
+    if header['type'] == 'bytes' and sum(header['lengths']) == len(payload):
+        parts, offset = [], 0
+        for length in header['lengths']:
+            parts.append(payload[offset:offset + length])
+            offset += length
+        return tuple(parts)
+    raise ValueError(f"malformed shared cache entry: {header!r}")
+
+
+def check_private(directory):
+    """Refuse a shared directory that other users could plant entries in"""
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(
+            f"Shared cache directory {directory} must be owned by this user and not group or world writable"
+        )
+
+
+def _remove_directory(directory, owner):
+    """Remove a private cache directory, but only from the process that created it"""
+    if os.getpid() == owner:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class SharedFigureCache(FigureCache):
+    """FigureCache whose misses fall through to a directory shared between processes
+
+    Each process keeps its own LRU of hot entries in front of the shared
+    directory, which must be private to this user since entries are served as
+    read. Without a directory, a private one is created and removed when the
+    creating process exits; create the cache before forking so workers inherit it.
+    """
+
+    def __init__(self, directory=None, max_entries=32, max_shared_entries=256):
+        super().__init__(max_entries)
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='sales-figures-', dir=SHARED_DIRECTORY_BASE)
+            atexit.register(_remove_directory, directory, os.getpid())
+        else:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            check_private(directory)
+        self.directory = directory
+        self.max_shared_entries = max_shared_entries
+        self.shared_hits = 0
+
+    def get_or_build(self, key, build):
+        """Return the value for key from this process, the shared directory, or build"""
+        return super().get_or_build(key, lambda: self._load_or_build(key, build))
+
+    def _path(self, key):
+        """Entry file for a key; keys are tuples of strings, numbers and None"""
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest() + ENTRY_SUFFIX)
+
+    def _load_or_build(self, key, build):
+        """Read a shared entry, or build the value and share it"""
+        path = self._path(key)
+        try:
+            with open(path, mode='rb') as entry:
+                value = decode_entry(entry.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        else:
+            with self._lock:
+                self.shared_hits += 1
+            return value
+
+        value = build()
+        data = encode_entry(value)
+        if data is None:
+            return value
+        try:
+            self._share(path, data)
+        except OSError:
+            # Sharing is best effort; a full tmpfs only costs other workers a rebuild
+            pass
+        return value
+
+    def _share(self, path, data):
+        """Atomically write an encoded entry, then prune the oldest"""
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, mode='wb') as entry:
+                entry.write(data)
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        self._prune()
+
+    def _entry_names(self):
+        """Names of the complete entries in the shared directory"""
+        return [name for name in os.listdir(self.directory) if name.endswith(ENTRY_SUFFIX)]
+
+    def _prune(self):
+        """Delete the oldest entries beyond max_shared_entries"""
+        entries = []
+        for name in self._entry_names():
+            try:
+                entries.append((os.stat(os.path.join(self.directory, name)).st_mtime_ns, name))
+            except FileNotFoundError:
+                continue
+        for _, name in sorted(entries)[:max(0, len(entries) - self.max_shared_entries)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+
+    def stats(self):
+        """Return the cache counters, including hits served from the shared directory"""
+        stats = super().stats()
+        with self._lock:
+            stats['shared_hits'] = self.shared_hits
+        stats['shared_entries'] = len(self._entry_names())
+        return stats
@@ -1,39 +1,379 @@
+import argparse
+import collections
 import csv
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import columnar_store
+import partitioned_dataset
+import validation
 
 DATA_DIRECTORY = "./data"
 OUTPUT_FILE_PATH = "./formatted_data.csv"
+CACHE_DIRECTORY = "./.ingest_cache"
+MANIFEST_FILE_NAME = "manifest.json"
+
+PRODUCT = "pink morsel"
+FIELDNAMES = ["sales", "date", "region"]
+
+# Rows parsed per chunk; bounds memory per worker regardless of file size
+CHUNK_SIZE = 200_000
+
+
+def list_data_files(data_directory=DATA_DIRECTORY):
+    """Return the input CSV paths in the order they are written to the output"""
+    # os.listdir order is kept so the output matches the original script byte for byte
+    return [os.path.join(data_directory, file_name) for file_name in os.listdir(data_directory)]
+
+
+def write_partitions(dataset_directory, file_path, chunk, products, sales, started):
+    """Append a chunk's rows for every product to their product/month partitions
+
+    ``started`` holds the partition parts this input file has already created,
+    so each part is truncated and given a header exactly once.
+    """
+    frame = pd.DataFrame({
+        "sales": sales,
+        "date": chunk["date"].to_numpy(),
+        "region": chunk["region"].to_numpy(),
+        "product": products.to_numpy(),
+        "month": chunk["date"].str.slice(0, 7).to_numpy(),
+    })
+    for (product, month), group in frame.groupby(["product", "month"], sort=False):
+        path = partitioned_dataset.partition_path(dataset_directory, product, month, file_path)
+        first_write = path not in started
+        if first_write:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            started.add(path)
+        with open(path, mode="w" if first_write else "a", newline="") as partition_file:
+            writer = csv.writer(partition_file)
+            if first_write:
+                writer.writerow(FIELDNAMES)
+            writer.writerows(zip(group["sales"].tolist(), group["date"].tolist(), group["region"].tolist()))
+
+
+def format_file(file_path, part_path, chunk_size=CHUNK_SIZE, dataset_directory=None,
+                date_range=validation.DATE_RANGE):
+    """Stream one input file into a headerless part file, returning its validation summary
+
+    Pink Morsel rows go to the part file; with a dataset directory, every
+    product's rows are also written to the partitioned dataset in the same pass.
+    Rows failing validation go to the part's quarantine file instead. The summary
+    counts rows written, accepted and rejected, and rejections per reason.
+    """
+    try:
+        return format_rows(file_path, part_path, chunk_size, dataset_directory, date_range, engine="c")
+    except pd.errors.ParserError:
+        # A line has too many fields or a quote is never closed; only the Python
+        # parser can hand such lines back
+        return format_rows(file_path, part_path, chunk_size, dataset_directory, date_range, engine="python")
+
+
+def read_chunks(reader, stop_on_error):
+    """Yield a reader's chunks, ending quietly at a parse error if asked"""
+    try:
+        yield from reader
+    except pd.errors.ParserError:
+        if not stop_on_error:
+            raise
+
+
+def data_lines(file_path):
+    """Iterate the non-blank lines after the header, as decoded for parsing"""
+    with open(file_path, mode="r", encoding="utf-8", errors="replace", newline="") as input_file:
+        lines = (line.rstrip("\r\n") for line in input_file)
+        next((line for line in lines if line), None)
+        yield from (line for line in lines if line)
+
+
+def format_rows(file_path, part_path, chunk_size, dataset_directory, date_range, engine):
+    """Validate and format one input file with the given pandas parser engine"""
+    file_name = os.path.basename(file_path)
+    summary = {"rows": 0, "accepted": 0, "rejected": 0, "reasons": {}}
+    bad_lines = []
+    options = {"engine": engine}
+    if engine == "python":
+        options["on_bad_lines"] = bad_lines.append
+    started = set()
+    with open(part_path, mode="w", newline="") as part_file, \
+            open(quarantine_part_path(part_path), mode="w", newline="") as quarantine_file:
+        writer = csv.writer(part_file)
+        quarantine = csv.writer(quarantine_file)
+        try:
+            reader = pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=chunk_size,
+                                 encoding_errors="replace", **options)
+        except pd.errors.EmptyDataError:
+            # No header at all; the original loop read such a file as having no rows,
+            # and it is quarantined as one record so a truncated drop is noticed
+            quarantine.writerow((file_name, "", "empty file", ""))
+            summary["rejected"] += 1
+            summary["reasons"]["empty file"] = 1
+            reader = []
+        for chunk in read_chunks(reader, stop_on_error=engine == "python"):
+            valid, failures, parsed = validation.validate_chunk(chunk, date_range)
+            if failures:
+                quarantine.writerows(validation.quarantine_rows(file_name, chunk, valid, failures))
+                validation.count_reasons(summary, failures)
+                chunk = chunk[valid]
+            summary["accepted"] += len(chunk)
+            summary["rejected"] += int((~valid).sum())
+            if chunk.empty:
+                continue
+
+            products = chunk["product"].str.lower()
+            # Python float() times int, as the original script computed each sale
+            sales = (parsed["price"] * parsed["quantity"])[valid]
+            selected = (products == PRODUCT).to_numpy()
+            rows = list(zip(
+                sales[selected].tolist(),
+                chunk["date"].to_numpy()[selected].tolist(),
+                chunk["region"].to_numpy()[selected].tolist(),
+            ))
+            writer.writerows(rows)
+            summary["rows"] += len(rows)
+            if dataset_directory is not None:
+                write_partitions(dataset_directory, file_path, chunk, products, sales, started)
+
+        # Lines the parser skipped have no record number
+        quarantine.writerows((file_name, "", "wrong number of fields", ",".join(fields)) for fields in bad_lines)
+        if bad_lines:
+            summary["rejected"] += len(bad_lines)
+            summary["reasons"]["wrong number of fields"] = len(bad_lines)
+        if engine == "python":
+            # The C parser reads every line or raises; the Python one swallows everything
+            # after a quote that is never closed, so reconcile against the file's lines
+            lost = sum(1 for _ in data_lines(file_path)) - summary["accepted"] - summary["rejected"]
+            if lost > 0:
+                tail = collections.deque(data_lines(file_path), maxlen=lost)
+                quarantine.writerows((file_name, "", "unterminated quote", line) for line in tail)
+                summary["rejected"] += lost
+                summary["reasons"]["unterminated quote"] = lost
+    return summary
+
+
+def write_output(part_paths, output_path=OUTPUT_FILE_PATH, fieldnames=FIELDNAMES):
+    """Concatenate part files under a header and atomically replace the output"""
+    output_directory = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.NamedTemporaryFile(
+        mode="w", newline="", dir=output_directory, suffix=".tmp", delete=False
+    ) as output_file:
+        csv.writer(output_file).writerow(fieldnames)
+        for part_path in part_paths:
+            with open(part_path, mode="r", newline="") as part_file:
+                shutil.copyfileobj(part_file, output_file)
+    os.replace(output_file.name, output_path)
+
+
+def quarantine_part_path(part_path):
+    """Return where the rejected rows of a part file are written"""
+    return part_path + ".quarantine"
+
+
+def write_quarantine(part_paths, summaries, output_path):
+    """Assemble the quarantine CSV and validation report next to the output
+
+    Returns the report.
+    """
+    write_output([quarantine_part_path(path) for path in part_paths],
+                 validation.quarantine_path_for(output_path), validation.QUARANTINE_FIELDNAMES)
+    return validation.write_report(summaries, validation.report_path_for(output_path))
+
+
+def hash_file(file_path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, mode="rb") as input_file:
+        for block in iter(lambda: input_file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(cache_directory=CACHE_DIRECTORY):
+    """Load the per-file ingestion manifest, or an empty one if none exists"""
+    manifest_path = os.path.join(cache_directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, mode="r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(manifest, cache_directory=CACHE_DIRECTORY):
+    """Atomically write the per-file ingestion manifest"""
+    manifest_path = os.path.join(cache_directory, MANIFEST_FILE_NAME)
+    with open(manifest_path + ".tmp", mode="w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def cached_part_path(cache_directory, file_path):
+    """Return where the formatted part of an input file is cached"""
+    return os.path.join(cache_directory, os.path.basename(file_path) + ".part")
+
+
+def run_jobs(file_paths, part_paths, workers=None, chunk_size=CHUNK_SIZE, dataset_directory=None,
+             date_range=validation.DATE_RANGE):
+    """Format each input file into its part file, in parallel where worthwhile
+
+    Returns each file's validation summary.
+    """
+    if not file_paths:
+        return []
+    workers = workers or min(len(file_paths), os.cpu_count() or 1)
+    if workers == 1:
+        return [format_file(path, part, chunk_size, dataset_directory, date_range)
+                for path, part in zip(file_paths, part_paths)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            format_file, file_paths, part_paths, [chunk_size] * len(file_paths),
+            [dataset_directory] * len(file_paths), [date_range] * len(file_paths)
+        ))
+
+
+def format_sales_data(data_directory=DATA_DIRECTORY, output_path=OUTPUT_FILE_PATH,
+                      workers=None, chunk_size=CHUNK_SIZE, partitioned=True,
+                      date_range=validation.DATE_RANGE):
+    """Build the formatted sales CSV from every file in the data directory
+
+    Files are parsed in chunks, fanned out across a process pool, and streamed
+    to the output in directory order. A date-sorted columnar copy is written
+    alongside for fast loading and, when partitioned, every product's sales go
+    to a dataset partitioned by product and month. Rows failing validation are
+    collected in a quarantine CSV, with per-file counts in a validation report.
+    Returns the number of rows written.
+    """
+    file_paths = list_data_files(data_directory)
+    dataset_directory = None
+    if partitioned:
+        dataset_directory = partitioned_dataset.dataset_path_for(output_path) + ".tmp"
+        shutil.rmtree(dataset_directory, ignore_errors=True)
+        os.makedirs(dataset_directory)
+
+    with tempfile.TemporaryDirectory() as parts_directory:
+        part_paths = [
+            os.path.join(parts_directory, f"{index}.part") for index in range(len(file_paths))
+        ]
+        summaries = run_jobs(file_paths, part_paths, workers, chunk_size, dataset_directory, date_range)
+        write_output(part_paths, output_path)
+        write_quarantine(part_paths, dict(zip(map(os.path.basename, file_paths), summaries)), output_path)
+    columnar_store.write_store(output_path)
+    if partitioned:
+        partitioned_dataset.write_manifest(dataset_directory)
+        partitioned_dataset.replace_dataset(dataset_directory, partitioned_dataset.dataset_path_for(output_path))
+
+    return sum(summary["rows"] for summary in summaries)
+
+
+def update_sales_data(data_directory=DATA_DIRECTORY, output_path=OUTPUT_FILE_PATH,
+                      cache_directory=CACHE_DIRECTORY, workers=None, chunk_size=CHUNK_SIZE,
+                      partitioned=True, date_range=validation.DATE_RANGE):
+    """Incrementally refresh the formatted sales CSV
+
+    A manifest in the cache directory records each input file's size, mtime,
+    content hash and validation summary alongside its formatted and quarantined
+    part files. Only new or changed files are parsed; parts of deleted files are
+    dropped, and the output, quarantine and report are reassembled from the
+    cached parts. Returns the number of rows in the output.
+    """
+    os.makedirs(cache_directory, exist_ok=True)
+    manifest = load_manifest(cache_directory)
+    file_paths = list_data_files(data_directory)
+
+    updated_manifest = {}
+    changed_paths = []
+    for file_path in file_paths:
+        file_name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        entry = dict(manifest.get(file_name, {}))
+        part_path = cached_part_path(cache_directory, file_name)
+        unchanged = (os.path.exists(part_path) and os.path.exists(quarantine_part_path(part_path))
+                     and entry.get("size") == stat.st_size)
+        # Size and mtime both matching is trusted; otherwise fall back to the content hash
+        if not (unchanged and entry.get("mtime_ns") == stat.st_mtime_ns):
+            content_hash = hash_file(file_path)
+            unchanged = unchanged and entry.get("sha256") == content_hash
+            entry.update(sha256=content_hash)
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        updated_manifest[file_name] = entry
+        if not unchanged:
+            changed_paths.append(file_path)
+
+    dataset_directory = partitioned_dataset.dataset_path_for(output_path) if partitioned else None
+    if dataset_directory and not partitioned_dataset.has_manifest(dataset_directory):
+        # The dataset has never been built in this layout, so every file needs its partitions written
+        shutil.rmtree(dataset_directory, ignore_errors=True)
+        changed_paths = file_paths
+
+    removed_names = set(manifest) - set(updated_manifest)
+    for file_name in removed_names:
+        part_path = cached_part_path(cache_directory, file_name)
+        for path in [part_path, quarantine_part_path(part_path)]:
+            if os.path.exists(path):
+                os.remove(path)
+    if dataset_directory:
+        for file_path in list(removed_names) + changed_paths:
+            partitioned_dataset.remove_parts(dataset_directory, file_path)
+
+    changed_parts = [cached_part_path(cache_directory, path) for path in changed_paths]
+    summaries = run_jobs(changed_paths, changed_parts, workers, chunk_size, dataset_directory, date_range)
+    for file_path, summary in zip(changed_paths, summaries):
+        updated_manifest[os.path.basename(file_path)].update(summary)
+
+    # Reassembling concatenates cached bytes only, so it is cheap relative to parsing
+    if changed_paths or removed_names or not os.path.exists(output_path):
+        part_paths = [cached_part_path(cache_directory, path) for path in file_paths]
+        write_output(part_paths, output_path)
+        write_quarantine(part_paths, {
+            os.path.basename(path): {key: updated_manifest[os.path.basename(path)][key]
+                                     for key in ("rows", "accepted", "rejected", "reasons")}
+            for path in file_paths
+        }, output_path)
+    save_manifest(updated_manifest, cache_directory)
+    store_path = columnar_store.store_path_for(output_path)
+    if not columnar_store.is_fresh(columnar_store.read_meta(store_path), output_path):
+        columnar_store.write_store(output_path, store_path)
+    if dataset_directory and (changed_paths or removed_names):
+        partitioned_dataset.write_manifest(dataset_directory)
+
+    return sum(entry["rows"] for entry in updated_manifest.values())
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Format Pink Morsel sales data into a single CSV")
+    parser.add_argument("--data-dir", default=DATA_DIRECTORY, help="directory of daily sales CSVs")
+    parser.add_argument("--output", default=OUTPUT_FILE_PATH, help="path of the formatted CSV")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows parsed per chunk")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-parse files that changed since the last incremental run")
+    parser.add_argument("--cache-dir", default=CACHE_DIRECTORY, help="manifest and part file cache")
+    parser.add_argument("--no-partitions", action="store_true",
+                        help="skip writing the all-product dataset partitioned by product and month")
+    parser.add_argument("--date-range", default=",".join(validation.DATE_RANGE),
+                        help="inclusive earliest,latest accepted dates, or 'none' to accept any date")
+    args = parser.parse_args(argv)
+
+    partitioned = not args.no_partitions
+    date_range = None if args.date_range == "none" else tuple(args.date_range.split(","))
+    if args.incremental:
+        update_sales_data(args.data_dir, args.output, args.cache_dir, args.workers, args.chunk_size,
+                          partitioned, date_range)
+    else:
+        format_sales_data(args.data_dir, args.output, args.workers, args.chunk_size, partitioned, date_range)
+    print("Formatted CSV created successfully!")
+
+    with open(validation.report_path_for(args.output), mode="r") as report_file:
+        report = json.load(report_file)
+    if report["rejected"]:
+        print(f"Quarantined {report['rejected']} of {report['accepted'] + report['rejected']} rows "
+              f"in {validation.quarantine_path_for(args.output)}")
+
 
-# Step 1: Gather all rows for Pink Morsels
-pink_morsels_rows = []
-
-# Step 2: Loop over each CSV file in the data directory
-for file_name in os.listdir(DATA_DIRECTORY):
-    file_path = os.path.join(DATA_DIRECTORY, file_name)
-    with open(file_path, mode="r", newline="") as input_file:
-        reader = csv.DictReader(input_file)  # Use DictReader for clarity
-        # Step 3: Loop through each row in the file
-        for row in reader:
-            if row["product"].lower() == "pink morsel":
-                # Calculate sale
-                price = float(row["price"].lstrip("$"))
-                quantity = int(row["quantity"])
-                sale = price * quantity
-
-                # Add the formatted row to our list
-                pink_morsels_rows.append({
-                    "sales": sale,
-                    "date": row["date"],
-                    "region": row["region"]
-                })
-
-# Step 4: Write all collected rows to the output CSV
-with open(OUTPUT_FILE_PATH, mode="w", newline="") as output_file:
-    fieldnames = ["sales", "date", "region"]
-    writer = csv.DictWriter(output_file, fieldnames=fieldnames)
-    
-    writer.writeheader()
-    for row in pink_morsels_rows:
-        writer.writerow(row)
-
-print("Formatted CSV created successfully!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from werkzeug.security import safe_join
+
+import partitioned_dataset
+
+# A snapshot is a directory of content-hashed artifacts plus manifest.json:
+#   pages:   logical name -> hashed file (index.html)
+#   figures: product -> resolution -> region -> hashed figure JSON
+#   versions: product -> content hash of the data the figures were rendered from
+# Every artifact is also written gzip- and, when brotli is installed, brotli-compressed.
+# The page still loads its scripts, layout and callbacks from the running app, so it
+# is served by the app; the figure files are immutable and can be cached anywhere.
+SNAPSHOT_DIRECTORY = "./snapshot"
+MANIFEST_FILE_NAME = "manifest.json"
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always written
+    brotli = None
+
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def write_artifact(directory, name, body):
+    """Write body under a content-hashed name with precompressed copies; returns that name"""
+    stem, extension = os.path.splitext(name)
+    hashed_name = f"{stem}.{hashlib.sha256(body).hexdigest()[:16]}{extension}"
+    path = os.path.join(directory, hashed_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="wb") as artifact:
+        artifact.write(body)
+    with open(path + ".gz", mode="wb") as artifact:
+        artifact.write(gzip.compress(body, compresslevel=9))
+    if brotli is not None:
+        with open(path + ".br", mode="wb") as artifact:
+            artifact.write(brotli.compress(body))
+    return hashed_name
+
+
+def export_snapshot(directory=SNAPSHOT_DIRECTORY, products=None, resolutions=("raw",)):
+    """Render the page and every region's figure into a static snapshot; returns the manifest"""
+    # Imported here so serving a snapshot never depends on this module importing the app
+    import app as app_module
+
+    # Render from the data itself, never from a snapshot or cache the environment points at
+    dash_app = app_module.create_app(watch_interval=None, precomputed=None, shared_cache=None)
+    client = dash_app.server.test_client()
+    # Build beside the old snapshot and swap it in only when complete
+    final_directory, directory = directory, directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+    manifest = {"pages": {}, "figures": {}, "versions": {}}
+    manifest["pages"]["index.html"] = write_artifact(directory, "index.html", client.get("/").get_data())
+
+    for product in products or [app_module.PRODUCT]:
+        index = dash_app.product_data(product)[1]
+        manifest["versions"][product] = index.dataset.content_hash()
+        figures = manifest["figures"].setdefault(product, {})
+        for resolution in resolutions:
+            for region in ['all'] + index.regions:
+                body = dash_app.figure_json(region, resolution, None, product).encode()
+                name = f"figures/{partitioned_dataset.product_slug(product)}-{region}-{resolution}.json"
+                figures.setdefault(resolution, {})[region] = write_artifact(directory, name, body)
+
+    with open(os.path.join(directory, MANIFEST_FILE_NAME), mode="w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    partitioned_dataset.replace_dataset(directory, final_directory)
+    return manifest
+
+
+def load_manifest(directory):
+    """Return a snapshot's manifest, or None when there is no snapshot"""
+    if not directory:
+        return None
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, mode="r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def figure_file(manifest, product, region, resolution, content_hash):
+    """Return the hashed figure file for a view, or None if missing or rendered from other data"""
+    if manifest is None or manifest["versions"].get(product) != content_hash:
+        return None
+    return manifest["figures"].get(product, {}).get(resolution, {}).get(region)
+
+
+def resolve(directory, name, accept_encodings):
+    """Pick the best precompressed variant of an artifact, returning (path, encoding)
+
+    The path is None when name would escape the snapshot directory.
+    """
+    path = safe_join(directory, name)
+    if path is None:
+        return None, None
+    for encoding, suffix in ENCODINGS:
+        if encoding in accept_encodings and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Export the dashboard as precompressed static artifacts")
+    parser.add_argument("--output", default=SNAPSHOT_DIRECTORY, help="snapshot directory")
+    parser.add_argument("--products", default=None, help="comma-separated products (default: Pink Morsel)")
+    parser.add_argument("--resolutions", default="raw", help="comma-separated chart resolutions")
+    args = parser.parse_args(argv)
+
+    products = args.products.split(",") if args.products else None
+    manifest = export_snapshot(args.output, products, args.resolutions.split(","))
+    count = sum(len(regions) for figures in manifest["figures"].values() for regions in figures.values())
+    print(f"Exported {len(manifest['pages'])} pages and {count} figures to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -70,7 +70,7 @@ def test_data_loading():
         # Check required columns exist
         required_columns = ['date', 'sales']
         for col in required_columns:
-            assert col in data.columns, f"Data should contain '{col}' column"
+            assert col in data.to_frame().columns, f"Data should contain '{col}' column"
         
         print("✓ Test 3 passed: Data loads successfully")
         return True
@@ -78,6 +78,418 @@ def test_data_loading():
         print(f"✗ Test 3 failed: {e}")
         return False
 
+def test_region_index_matches_filter():
+    """Region slices and stats agree with a full scan of the data"""
+    import numpy as np
+    from app import load_data
+    from region_index import PRICE_INCREASE_DATE, RegionIndex
+
+    compact = load_data()
+    assert compact.sales.dtype == np.float32  # the shipped sales are whole dollars
+    data = compact.to_frame()
+    index = RegionIndex(data)
+
+    assert sorted(index.regions) == ['east', 'north', 'south', 'west']
+    for region in index.regions:
+        expected = data[data['region'].astype(str).str.lower() == region]
+        assert index.frame(region)['sales'].tolist() == expected['sales'].tolist()
+        assert index.stats(region)['max'] == expected['sales'].max()
+        before = expected[expected['date'] < PRICE_INCREASE_DATE]['sales'].sum()
+        assert abs(index.stats(region)['total_before_increase'] - before) < 1e-6
+    assert abs(index.stats('all')['total'] - data['sales'].sum()) < 1e-6
+
+def test_figure_cache():
+    """Figures are served from a bounded LRU cache with hit/miss counters"""
+    from app import create_app
+    from figure_cache import FigureCache
+
+    cache = FigureCache(max_entries=2)
+    for key in ['north', 'east', 'north', 'south']:
+        cache.get_or_build(key, lambda: key.upper())
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'evictions': 1, 'entries': 2, 'max_entries': 2}
+    assert cache.get_or_build('east', lambda: 'rebuilt') == 'rebuilt'
+
+    client = create_app().server.test_client()
+    first = client.get('/figures/north.json')
+    second = client.get('/figures/north.json')
+    assert first.status_code == 200 and first.data == second.data
+    assert 'North' in first.get_json()['layout']['title']['text']
+    assert client.get('/figures/atlantis.json').status_code == 404
+    stats = client.get('/cache/stats').get_json()
+    assert stats['hits'] >= 1 and stats['misses'] >= 2
+
+def test_downsampling():
+    """Aggregated and decimated views keep totals, real points and the price increase split"""
+    import numpy as np
+    from app import create_sales_chart, load_data
+    from downsampling import aggregate, lttb
+    from region_index import PRICE_INCREASE_DATE, RegionIndex
+
+    index = RegionIndex(load_data())
+    dates, sales = index.series('north')
+
+    for frequency in ['D', 'W', 'M']:
+        buckets, totals = aggregate(dates, sales, frequency)
+        assert abs(totals.sum() - sales.sum()) < 1e-6
+        assert PRICE_INCREASE_DATE.to_datetime64() in buckets
+        before = totals[buckets < PRICE_INCREASE_DATE.to_datetime64()].sum()
+        assert abs(before - index.stats('north')['total_before_increase']) < 1e-6
+
+    keep = lttb(dates.astype(np.int64), sales, 100)
+    assert len(keep) == 100 and keep[0] == 0 and keep[-1] == len(dates) - 1
+    assert np.all(np.diff(keep) > 0)
+
+    fig = create_sales_chart(index, 'all', 'monthly', ('2021-01-01', '2021-03-31'))
+    assert len(fig.data[0].x) == 4  # Jan 1-14, Jan 15-31, Feb, Mar
+
+def test_zoom_only_rebuilds_aggregated_views():
+    """Pans and zooms re-send the figure only when an aggregated view is re-bucketed"""
+    from app import create_app
+
+    client = create_app(watch_interval=None).server.test_client()
+
+    def update_chart(resolution, relayout_data, changed):
+        values = [('resolution_selector', 'value', resolution), ('sales_graph', 'relayoutData', relayout_data),
+                  ('data_version', 'data', None), ('product_selector', 'value', 'pink morsel'),
+                  ('region_selector', 'value', 'all')]
+        response = client.post('/_dash-update-component', json={
+            'output': 'sales_graph.figure',
+            'outputs': {'id': 'sales_graph', 'property': 'figure'},
+            'inputs': [{'id': id, 'property': prop, 'value': value} for id, prop, value in values],
+            'changedPropIds': changed,
+        })
+        return response.get_json()['response'].get('sales_graph')
+
+    zoom = {'xaxis.range[0]': '2021-01-01', 'xaxis.range[1]': '2021-03-31'}
+    assert update_chart('raw', zoom, ['sales_graph.relayoutData']) is None
+    assert update_chart('monthly', {'dragmode': 'pan'}, ['sales_graph.relayoutData']) is None
+    zoomed = update_chart('monthly', zoom, ['sales_graph.relayoutData'])['figure']
+    assert len(zoomed['data'][0]['x']) == 4
+    restored = update_chart('monthly', {'xaxis.autorange': True}, ['sales_graph.relayoutData'])['figure']
+    assert len(restored['data'][0]['x']) > 4
+    assert update_chart('raw', zoom, ['resolution_selector.value']) is not None
+
+def test_live_reload(tmp_path=None):
+    """A changed data file is swapped in without disturbing the old snapshot"""
+    import shutil
+    import tempfile
+    import app as app_module
+
+    tmp_path = tmp_path or tempfile.mkdtemp()
+    file_path = os.path.join(str(tmp_path), 'formatted_data.csv')
+    shutil.copy(app_module.FILE_PATH, file_path)
+    original_paths = app_module.FILE_PATH, app_module.STORE_PATH
+    app_module.FILE_PATH, app_module.STORE_PATH = file_path, file_path + '.columns'
+    try:
+        app = app_module.create_app(watch_interval=None)
+        client = app.server.test_client()
+        old_version, old_index = app.dataset.current
+        client.get('/figures/north.json')
+
+        assert app.dataset.refresh() is False
+        with open(file_path, mode='a') as data_file:
+            data_file.write('99999.0,2022-12-31,north\n')
+        assert app.dataset.refresh() is True
+
+        new_version, new_index = app.dataset.current
+        assert new_version != old_version
+        assert new_index.stats('north')['max'] == 99999.0
+        assert old_index.stats('north')['max'] < 99999.0
+        assert client.get('/cache/stats').get_json()['entries'] == 0
+    finally:
+        app_module.FILE_PATH, app_module.STORE_PATH = original_paths
+
+    # Any failed load is logged and retried; the watcher keeps running
+    import time
+    from live_data import LiveDataset
+    versions = iter(range(1, 1000))
+    loads = iter([{}, KeyError('sales'), IndexError(), {'reloaded': True}])
+    def load():
+        result = next(loads)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    dataset = LiveDataset(load, lambda: next(versions)).start(0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while dataset.current[1] != {'reloaded': True} and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        dataset.stop()
+    assert dataset.current[1] == {'reloaded': True}
+
+def test_metrics_endpoint():
+    """Opt-in instrumentation exposes stage timings on /metrics"""
+    import tempfile
+    from app import create_app
+    from instrumentation import METRICS, Profiler
+
+    METRICS.enabled = True
+    try:
+        client = create_app(watch_interval=None).server.test_client()
+        client.get('/figures/east.json')
+        body = client.get('/metrics').get_data(as_text=True)
+    finally:
+        METRICS.enabled = False
+    for stage in ['load_data', 'layout', 'filter', 'figure_build', 'serialize']:
+        assert f'sales_app_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'sales_app_figure_cache_misses_total' in body
+
+    from instrumentation import instrument_callback
+    @instrument_callback('failing')
+    def failing():
+        raise KeyError('sales')
+    METRICS.enabled = True
+    try:
+        failing()
+    except KeyError:
+        pass
+    finally:
+        METRICS.enabled = False
+    assert 'sales_app_callback_errors_total{callback="failing"} 1' in METRICS.render()
+
+    directory = tempfile.mkdtemp()
+    with Profiler('cprofile', rate=1.0, directory=directory).sample('update_chart'):
+        sum(range(1000))
+    assert [name.endswith('.prof') for name in os.listdir(directory)] == [True]
+
+def test_metrics_shared_between_workers():
+    """Forked workers' metrics are summed into every /metrics response"""
+    import multiprocessing
+    import tempfile
+    from instrumentation import Metrics
+
+    metrics = Metrics(enabled=True)
+    metrics.share(tempfile.mkdtemp(), lambda: {'figure_cache_hits_total': 1})
+    metrics.observe('stage_seconds', 0.01, stage='load_data')
+
+    def worker():
+        metrics.observe('callback_seconds', 0.002, callback='update_chart')
+        metrics.flush()
+
+    for _ in range(2):
+        process = multiprocessing.get_context('fork').Process(target=worker)
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+    body = metrics.render()
+    assert 'sales_app_callback_seconds_count{callback="update_chart"} 2' in body
+    assert 'sales_app_stage_seconds_count{stage="load_data"} 1' in body
+    assert 'sales_app_figure_cache_hits_total 3' in body
+
+def test_product_selector(tmp_path=None):
+    """Other products are charted from their own partitions"""
+    import shutil
+    import tempfile
+    import app as app_module
+    from single_formatted_output import DATA_DIRECTORY, format_sales_data
+
+    tmp_path = str(tmp_path or tempfile.mkdtemp())
+    file_path = os.path.join(tmp_path, 'formatted_data.csv')
+    shutil.copytree(DATA_DIRECTORY, os.path.join(tmp_path, 'data'))
+    format_sales_data(os.path.join(tmp_path, 'data'), file_path, workers=1)
+    original_paths = app_module.FILE_PATH, app_module.STORE_PATH, app_module.DATASET_PATH
+    app_module.FILE_PATH = file_path
+    app_module.STORE_PATH = app_module.columnar_store.store_path_for(file_path)
+    app_module.DATASET_PATH = app_module.partitioned_dataset.dataset_path_for(file_path)
+    try:
+        app = app_module.create_app(watch_interval=None)
+        assert 'product_selector' in str(app.layout) and 'Gold Morsel' in str(app.layout)
+        client = app.server.test_client()
+        figure = client.get('/figures/east.json?product=gold+morsel').get_json()
+        assert figure['layout']['title']['text'] == 'Gold Morsel Sales Over Time - East'
+        assert client.get('/figures/east.json?product=tin+morsel').status_code == 404
+
+        # Products added by a later ingestion run are served without a restart
+        escaped_url = '/figures/north.json?product=..%2F..%2Fescaped'
+        assert client.get(escaped_url).status_code == 404
+        with open(os.path.join(tmp_path, 'data', 'odd_products.csv'), 'w') as odd_file:
+            odd_file.write('product,price,quantity,date,region\n../../escaped,$1.00,1,2021-01-01,north\n')
+        format_sales_data(os.path.join(tmp_path, 'data'), file_path, workers=1)
+        assert '../../escaped' in app.product_names()
+        assert client.get(escaped_url).status_code == 200
+
+        # Snapshot artifacts of any product name stay inside the snapshot
+        from static_snapshot import export_snapshot
+        snapshot = os.path.join(tmp_path, 'exports', 'snapshot')
+        manifest = export_snapshot(snapshot, products=['../../escaped'])
+        assert os.listdir(os.path.join(tmp_path, 'exports')) == ['snapshot']
+        for name in manifest['figures']['../../escaped']['raw'].values():
+            assert os.path.dirname(name) == 'figures' and os.path.exists(os.path.join(snapshot, name))
+    finally:
+        app_module.FILE_PATH, app_module.STORE_PATH, app_module.DATASET_PATH = original_paths
+
+def test_clientside_series():
+    """Clientside mode ships compact, gzip-compressed series revalidated by ETag"""
+    import gzip
+    import json
+    from app import create_app
+
+    app = create_app(watch_interval=None, clientside=True)
+    assert any(output.startswith('sales_graph.figure@') for output in app.callback_map)
+    client = app.server.test_client()
+
+    response = client.get('/series.json', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    series = json.loads(gzip.decompress(response.data))
+    assert set(series['regions']) == {'all', 'north', 'east', 'south', 'west'}
+    north = app.dataset.current[1].frame('north')
+    assert series['regions']['north']['sales'] == north['sales'].tolist()
+    assert len(series['regions']['north']['days']) == len(north)
+
+    # Region changes pick the summary shipped with the series instead of calling the server
+    from price_impact import summary_text
+    assert series['regions']['north']['summary'] == summary_text(app.impact_report(), 'north')
+    summary_callback = app.callback_map['impact_summary.children']
+    assert 'region_selector' not in [item['id'] for item in summary_callback['inputs']]
+
+    revalidated = client.get('/series.json', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+def test_static_snapshot(tmp_path=None):
+    """Exported snapshots are served without building figures at runtime"""
+    import gzip
+    import tempfile
+    import app as app_module
+    from static_snapshot import export_snapshot, load_manifest as static_snapshot_manifest
+
+    directory = os.path.join(str(tmp_path or tempfile.mkdtemp()), 'snapshot')
+    manifest = export_snapshot(directory)
+    assert set(manifest['figures']['pink morsel']['raw']) == {'all', 'north', 'east', 'south', 'west'}
+    for name in manifest['pages'].values():
+        assert os.path.exists(os.path.join(directory, name + '.gz'))
+
+    create_sales_chart = app_module.create_sales_chart
+    def fail(*args, **kwargs):
+        raise AssertionError("figure built at runtime")
+    # A copy of the same rows, with a new mtime and no columnar store, still matches the snapshot
+    import shutil
+    copy_path = os.path.join(os.path.dirname(directory), 'formatted_data.csv')
+    shutil.copy(app_module.FILE_PATH, copy_path)
+    original_paths = app_module.FILE_PATH, app_module.STORE_PATH
+    app_module.create_sales_chart = fail
+    try:
+        client = app_module.create_app(watch_interval=None, precomputed=directory).server.test_client()
+        figure = client.get('/figures/west.json')
+        app_module.FILE_PATH, app_module.STORE_PATH = copy_path, copy_path + '.columns'
+        copied = app_module.create_app(watch_interval=None, precomputed=directory).server.test_client()
+        assert copied.get('/figures/west.json').data == figure.data
+    finally:
+        app_module.create_sales_chart = create_sales_chart
+        app_module.FILE_PATH, app_module.STORE_PATH = original_paths
+    with open(os.path.join(directory, manifest['figures']['pink morsel']['raw']['west']), 'rb') as snapshot:
+        assert figure.data == snapshot.read()
+
+    page = client.get('/snapshot/' + manifest['pages']['index.html'], headers={'Accept-Encoding': 'gzip'})
+    assert page.headers['Content-Encoding'] == 'gzip'
+    assert b'<html' in gzip.decompress(page.data).lower()
+
+    # Re-exporting on a host configured to serve the snapshot replaces it in place
+    import subprocess
+    subprocess.run(
+        [sys.executable, 'static_snapshot.py', '--output', directory], check=True, capture_output=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)), env={**os.environ, 'SALES_PRECOMPUTED_DIR': directory}
+    )
+    assert static_snapshot_manifest(directory)['figures'] == manifest['figures']
+    assert not os.path.exists(directory + '.tmp')
+
+    # Names may not reach a sibling directory sharing the snapshot's prefix
+    sibling = directory + 'X'
+    os.makedirs(sibling, exist_ok=True)
+    with open(os.path.join(sibling, 'secret.txt'), 'w') as secret:
+        secret.write('secret')
+    for name in ['../snapshotX/secret.txt', '..%2fsnapshotX%2fsecret.txt', '%2e%2e/snapshotX/secret.txt']:
+        assert client.get('/snapshot/' + name).status_code == 404
+
+def test_price_impact():
+    """The price impact endpoint matches a direct scan and is computed once per data version"""
+    from app import create_app
+
+    app = create_app(watch_interval=None)
+    client = app.server.test_client()
+    report = client.get('/api/price-impact').get_json()
+    assert set(report['regions']) == {'north', 'east', 'south', 'west'}
+
+    df = app.dataset.current[1].dataset.to_frame()
+    daily = df.groupby('date')['sales'].sum()
+    before = daily[daily.index < '2021-01-15'].mean()
+    after = daily[daily.index >= '2021-01-15'].mean()
+    assert abs(report['total']['before']['mean_daily'] - before) < 1e-6
+    assert abs(report['total']['after']['mean_daily'] - after) < 1e-6
+    assert abs(report['total']['percent_change']['mean_daily'] - (after - before) / before * 100) < 1e-6
+    rolling = daily.rolling('7D').mean()
+    assert abs(report['total']['before']['rolling_7'] - rolling[rolling.index < '2021-01-15'].iloc[-1]) < 1e-6
+    assert abs(report['total']['after']['rolling_7'] - rolling[rolling.index < '2021-01-22'].iloc[-1]) < 1e-6
+    north = df[df['region'] == 'north']
+    assert abs(report['regions']['north']['before']['total']
+               + report['regions']['north']['after']['total'] - north['sales'].sum()) < 1e-6
+
+    assert app.impact_report() is app.impact_report()
+    assert client.get('/api/price-impact?product=nothing').status_code == 404
+
+def test_shared_figure_cache(tmp_path=None):
+    """Worker processes share built figures through a directory, keyed by data version"""
+    import tempfile
+    from app import create_app
+    from shared_cache import SharedFigureCache
+
+    directory = str(tmp_path) if tmp_path else tempfile.mkdtemp()
+    first = SharedFigureCache(directory, max_shared_entries=2)
+    second = SharedFigureCache(directory, max_shared_entries=2)
+    assert first.get_or_build(('north', 'v1'), lambda: 'north v1') == 'north v1'
+    assert second.get_or_build(('north', 'v1'), lambda: 'rebuilt') == 'north v1'
+    assert second.stats()['shared_hits'] == 1 and second.stats()['misses'] == 1
+
+    # A new data version misses everywhere and is built once
+    assert second.get_or_build(('north', 'v2'), lambda: 'north v2') == 'north v2'
+    assert first.get_or_build(('north', 'v2'), lambda: 'rebuilt') == 'north v2'
+    first.get_or_build(('south', 'v2'), lambda: 'south v2')
+    assert first.stats()['shared_entries'] == 2
+
+    # Entries are plain data, never unpickled, and only kept in a private directory
+    for value in [(b'body', b'\x1f\x8b'), {'total': {'before': 1.5, 'after': None}}]:
+        first.get_or_build(('value', repr(value)), lambda: value)
+        assert second.get_or_build(('value', repr(value)), lambda: 'rebuilt') == value
+    shared = tempfile.mkdtemp()
+    os.chmod(shared, 0o777)
+    try:
+        SharedFigureCache(shared)
+    except PermissionError:
+        pass
+    else:
+        raise AssertionError("world-writable shared cache directory accepted")
+
+    app = create_app(watch_interval=None, shared_cache='auto')
+    client = app.server.test_client()
+    client.get('/figures/east.json')
+    stats = client.get('/cache/stats').get_json()
+    assert stats['shared_entries'] >= 1 and stats['misses'] >= 1
+
+# Cold start (imports, data load and create_app) must stay within this many seconds
+STARTUP_BUDGET_SECONDS = 5.0
+
+def test_fast_start_budget():
+    """A fast-start app is ready within the startup budget, before building any figure"""
+    import json
+    import subprocess
+
+    script = (
+        "import json, time\n"
+        "started = time.perf_counter()\n"
+        "from app import create_app\n"
+        "app = create_app(watch_interval=None, fast_start=True)\n"
+        "ready = app.server.test_client().get('/readyz').get_json()\n"
+        "print(json.dumps({'seconds': time.perf_counter() - started, 'ready': ready}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result['ready']['ready'] is True
+    assert result['ready']['figures_cached'] == 0
+    assert result['seconds'] < STARTUP_BUDGET_SECONDS, f"cold start took {result['seconds']:.2f}s"
+
 def run_all_tests():
     """Run all tests and return exit code"""
     print("=" * 60)
@@ -87,7 +499,20 @@ def run_all_tests():
     tests = [
         ("App Creation", test_app_creation),
         ("Layout Components", test_layout_components),
-        ("Data Loading", test_data_loading)
+        ("Data Loading", test_data_loading),
+        ("Region Index", test_region_index_matches_filter),
+        ("Figure Cache", test_figure_cache),
+        ("Downsampling", test_downsampling),
+        ("Zoom Updates", test_zoom_only_rebuilds_aggregated_views),
+        ("Live Reload", test_live_reload),
+        ("Metrics Endpoint", test_metrics_endpoint),
+        ("Shared Metrics", test_metrics_shared_between_workers),
+        ("Product Selector", test_product_selector),
+        ("Clientside Series", test_clientside_series),
+        ("Static Snapshot", test_static_snapshot),
+        ("Price Impact", test_price_impact),
+        ("Shared Figure Cache", test_shared_figure_cache),
+        ("Fast Start Budget", test_fast_start_budget)
     ]
     
     passed = 0
@@ -98,7 +523,8 @@ def run_all_tests():
         print("-" * 40)
         
         try:
-            if test_func():
+            # Older tests report failure by returning False; newer ones raise
+            if test_func() is not False:
                 passed += 1
             else:
                 failed += 1
@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+
+# Add the current directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import find_regressions, generate_data, main, run_benchmark, run_isolated
+from load_test import run_scaling
+
+
+def test_benchmark_report(tmp_path):
+    """A small benchmark run produces a JSON report that can be compared to a baseline"""
+    report = run_benchmark(scales=[1], stages=['ingest', 'load_data_store', 'memory', 'chart'],
+                           repeats=2, workdir=str(tmp_path))
+    json.dumps(report)
+
+    (result,) = report['results']
+    assert result['input_rows'] == 3 * 13720
+    assert result['stages']['ingest']['rows'] == 5880
+    assert result['stages']['ingest']['rows_per_second'] > 0
+    assert result['stages']['load_data_store']['peak_rss_mb'] > 0
+    memory = result['stages']['memory']
+    assert memory['dataset_rows'] == 5880
+    assert memory['compact_bytes'] == 9 * 5880  # float32 sales, int32 days, int8 regions
+    assert memory['compact_bytes'] * 5 < memory['frame_bytes']
+    assert set(result['stages']['chart']['regions']) == {'all', 'north', 'east', 'south', 'west'}
+
+    assert find_regressions(report, report, tolerance=0.2) == []
+    slower = json.loads(json.dumps(report))
+    slower['results'][0]['stages']['ingest']['seconds'] *= 10
+    assert find_regressions(slower, report, tolerance=0.2) == [
+        f"scale 1 ingest: {report['results'][0]['stages']['ingest']['seconds']:.4g}"
+        f" -> {slower['results'][0]['stages']['ingest']['seconds']:.4g}"
+    ]
+
+
+def test_benchmark_failures(tmp_path):
+    """Stages that raise or hang are reported as errors and fail the run"""
+    assert main(['--scales', '1', '--stages', 'ingest,unknown', '--workdir', str(tmp_path),
+                 '--output', str(tmp_path / 'bench.json')]) == 1
+    (result,) = json.loads((tmp_path / 'bench.json').read_text())['results']
+    assert result['stages']['ingest']['rows'] == 5880
+    assert result['stages']['unknown'] == {'error': "ValueError: Unknown stage: 'unknown'"}
+
+    generate_data(str(tmp_path / 'data'), 1)
+    assert 'rows' in run_isolated('ingest', str(tmp_path))
+    assert run_isolated('chart', str(tmp_path), repeats=10 ** 9, timeout=1.0) == {
+        'error': 'timed out after 1 seconds'
+    }
+
+
+def test_load_test_against_prefork_server():
+    """The load test starts serve.py at each worker count and reports throughput"""
+    report = run_scaling(worker_counts=[1, 2], clients=2, duration=1.0)
+    json.dumps(report)
+
+    assert [result['workers'] for result in report['results']] == [1, 2]
+    for result in report['results']:
+        assert result['requests'] > 0 and result['errors'] == 0
+    assert report['results'][0]['speedup'] == 1.0
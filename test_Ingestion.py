@@ -0,0 +1,229 @@
+import csv
+import json
+import os
+import sys
+
+# Add the current directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+import partitioned_dataset
+import single_formatted_output
+import validation
+from single_formatted_output import format_sales_data, update_sales_data
+
+SAMPLE_ROWS = [
+    ["product", "price", "quantity", "date", "region"],
+    ["pink morsel", "$3.00", "546", "2018-02-06", "north"],
+    ["gold morsel", "$9.99", "10", "2018-02-06", "north"],
+    ["Pink Morsel", "$4.99", "3", "2021-01-15", "south"],
+    ["pink morsel", "$5.00", "0", "2021-01-16", "west"],
+]
+
+
+def write_sample(data_directory, file_name, rows=SAMPLE_ROWS):
+    """Write a raw daily sales file into the data directory"""
+    with open(data_directory / file_name, mode="w", newline="") as sample_file:
+        csv.writer(sample_file).writerows(rows)
+
+
+def legacy_output(data_directory):
+    """Reproduce the original row-by-row script's output bytes"""
+    rows = []
+    for file_name in os.listdir(data_directory):
+        with open(os.path.join(data_directory, file_name), mode="r", newline="") as input_file:
+            for row in csv.DictReader(input_file):
+                if row["product"].lower() == "pink morsel":
+                    sale = float(row["price"].lstrip("$")) * int(row["quantity"])
+                    rows.append({"sales": sale, "date": row["date"], "region": row["region"]})
+    output_path = os.path.join(os.path.dirname(data_directory), "legacy.csv")
+    with open(output_path, mode="w", newline="") as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=["sales", "date", "region"])
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(output_path, mode="rb") as output_file:
+        return output_file.read()
+
+
+def test_output_matches_legacy_script(tmp_path):
+    """The chunked, parallel engine writes exactly what the old loop wrote"""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    write_sample(data_directory, "daily_sales_data_0.csv")
+    write_sample(data_directory, "daily_sales_data_1.csv", SAMPLE_ROWS[:1] + SAMPLE_ROWS[3:])
+    write_sample(data_directory, "daily_sales_data_2.csv", [])
+    output_path = tmp_path / "formatted_data.csv"
+
+    for workers, chunk_size in [(1, 2), (2, 1000)]:
+        rows_written = format_sales_data(data_directory, output_path, workers, chunk_size)
+        assert rows_written == 5
+        assert output_path.read_bytes() == legacy_output(data_directory)
+
+
+def test_incremental_update_only_parses_changed_files(tmp_path, monkeypatch):
+    """Incremental runs re-parse new or changed files and drop deleted ones"""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    write_sample(data_directory, "daily_sales_data_0.csv")
+    write_sample(data_directory, "daily_sales_data_1.csv")
+    output_path = tmp_path / "formatted_data.csv"
+    cache_directory = tmp_path / "cache"
+
+    parsed = []
+    format_file = single_formatted_output.format_file
+
+    def tracking_format_file(file_path, *args):
+        parsed.append(os.path.basename(file_path))
+        return format_file(file_path, *args)
+
+    monkeypatch.setattr(single_formatted_output, "format_file", tracking_format_file)
+
+    assert update_sales_data(data_directory, output_path, cache_directory, workers=1) == 6
+    assert sorted(parsed) == ["daily_sales_data_0.csv", "daily_sales_data_1.csv"]
+    assert output_path.read_bytes() == legacy_output(data_directory)
+
+    parsed.clear()
+    write_sample(data_directory, "daily_sales_data_1.csv", SAMPLE_ROWS[:2])
+    write_sample(data_directory, "daily_sales_data_2.csv")
+    assert update_sales_data(data_directory, output_path, cache_directory, workers=1) == 7
+    assert sorted(parsed) == ["daily_sales_data_1.csv", "daily_sales_data_2.csv"]
+    assert output_path.read_bytes() == legacy_output(data_directory)
+
+    parsed.clear()
+    (data_directory / "daily_sales_data_0.csv").unlink()
+    assert update_sales_data(data_directory, output_path, cache_directory, workers=1) == 4
+    assert parsed == []
+    assert output_path.read_bytes() == legacy_output(data_directory)
+
+
+def test_columnar_store_matches_csv(tmp_path):
+    """Ingestion writes a date-sorted columnar store that goes stale with the CSV"""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    write_sample(data_directory, "daily_sales_data_0.csv", SAMPLE_ROWS[:1] + SAMPLE_ROWS[4:1:-1])
+    output_path = tmp_path / "formatted_data.csv"
+    format_sales_data(data_directory, output_path, workers=1)
+
+    store_path = columnar_store.store_path_for(str(output_path))
+    store = columnar_store.read_store(store_path, str(output_path))
+    expected = pd.read_csv(output_path, parse_dates=["date"]).sort_values("date", kind="stable")
+    assert store.days.dtype == np.int32 and store.region_codes.dtype == np.int8
+    assert store.sales.dtype == np.float64  # 14.97 has no exact float32
+    assert store.dates().tolist() == expected["date"].dt.date.tolist()
+    assert store.sales.tolist() == expected["sales"].tolist()
+    assert store.to_frame()["region"].astype(str).tolist() == expected["region"].str.lower().tolist()
+    grouped = store.take(np.argsort(store.region_codes, kind="stable"))
+    assert isinstance(store.group_by_region().days, np.memmap)
+    assert store.group_by_region().days.tolist() == grouped.days.tolist()
+
+    with open(output_path, mode="a") as output_file:
+        output_file.write("1.0,2022-01-01,east\r\n")
+    assert columnar_store.read_store(store_path, str(output_path)) is None
+
+
+def test_partitioned_dataset(tmp_path):
+    """Every product is partitioned by month in one pass and kept in step incrementally"""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    write_sample(data_directory, "daily_sales_data_0.csv")
+    output_path = tmp_path / "formatted_data.csv"
+    dataset_path = partitioned_dataset.dataset_path_for(str(output_path))
+
+    format_sales_data(data_directory, output_path, workers=1)
+    manifest = partitioned_dataset.read_manifest(dataset_path)
+    assert manifest == {
+        "gold morsel": {"2018-02": ["daily_sales_data_0.csv"]},
+        "pink morsel": {"2018-02": ["daily_sales_data_0.csv"], "2021-01": ["daily_sales_data_0.csv"]},
+    }
+    gold = partitioned_dataset.load_product(dataset_path, "gold morsel")
+    assert gold["sales"].tolist() == [99.9]
+    pink = partitioned_dataset.load_product(dataset_path, "pink morsel", months={"2021-01"})
+    assert pink["sales"].tolist() == [3 * 4.99, 0.0]
+
+    cache_directory = tmp_path / "cache"
+    update_sales_data(data_directory, output_path, cache_directory, workers=1)
+    write_sample(data_directory, "daily_sales_data_0.csv", SAMPLE_ROWS[:3])
+    write_sample(data_directory, "daily_sales_data_1.csv", SAMPLE_ROWS[:1] + SAMPLE_ROWS[3:4])
+    update_sales_data(data_directory, output_path, cache_directory, workers=1)
+    assert partitioned_dataset.read_manifest(dataset_path)["pink morsel"] == {
+        "2018-02": ["daily_sales_data_0.csv"],
+        "2021-01": ["daily_sales_data_1.csv"],
+    }
+
+    # Product names are encoded into a single directory and come back unchanged
+    write_sample(data_directory, "daily_sales_data_2.csv", SAMPLE_ROWS[:1] + [
+        [product, "$1.00", "1", "2018-02-06", "north"] for product in ["../../escaped", "a/b", "foo_bar", ""]
+    ])
+    format_sales_data(data_directory, output_path, workers=1)
+    manifest = partitioned_dataset.read_manifest(dataset_path)
+    assert {"../../escaped", "a/b", "foo_bar"} <= set(manifest)
+    assert "" not in manifest
+    assert sorted(os.listdir(dataset_path)) == sorted(
+        [partitioned_dataset.MANIFEST_FILE_NAME]
+        + [f"product={partitioned_dataset.product_slug(product)}" for product in manifest]
+    )
+    assert partitioned_dataset.load_product(dataset_path, "a/b")["sales"].tolist() == [1.0]
+
+
+def test_validation_quarantines_bad_rows(tmp_path):
+    """Malformed rows are quarantined with reasons while the rest are formatted"""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    bad_rows = [
+        ["pink morsel", "3.00", "5", "2018-02-07", "north"],
+        ["pink morsel", "$3.00", "five", "2018-02-30", "north"],
+        ["pink morsel", "$3.00", "5", "1999-12-31", "atlantis"],
+    ]
+    write_sample(data_directory, "daily_sales_data_0.csv", SAMPLE_ROWS[:3] + bad_rows + SAMPLE_ROWS[3:])
+    write_sample(data_directory, "daily_sales_data_1.csv",
+                 SAMPLE_ROWS[:2] + [["pink morsel", "$3.00", "5", "2018-02-07", "north", "extra"]])
+    write_sample(data_directory, "daily_sales_data_2.csv", [])
+    with open(data_directory / "daily_sales_data_3.csv", mode="wb") as sample_file:
+        sample_file.write(b"product,price,quantity,date,region\n"
+                          b"pink\xff morsel,$3.00,5,2018-02-07,north\n"
+                          b"pink morsel,$3.00,5,2018-02-07,sou\xffth\n")
+    with open(data_directory / "daily_sales_data_4.csv", mode="w", newline="") as sample_file:
+        sample_file.write("product,price,quantity,date,region\n"
+                          'pink morsel,"$3.00,5,2018-02-07,north\n'
+                          "pink morsel,$3.00,5,2018-02-08,north\n")
+    output_path = tmp_path / "formatted_data.csv"
+
+    # Only the well-formed rows reach the output, exactly as the old script formatted them
+    clean_directory = tmp_path / "clean"
+    clean_directory.mkdir()
+    write_sample(clean_directory, "daily_sales_data_0.csv")
+    write_sample(clean_directory, "daily_sales_data_1.csv", SAMPLE_ROWS[:2])
+    assert format_sales_data(data_directory, output_path, workers=1, chunk_size=2) == 4
+    assert output_path.read_bytes() == legacy_output(clean_directory)
+
+    quarantine = pd.read_csv(validation.quarantine_path_for(str(output_path)), dtype=str, keep_default_na=False)
+    assert sorted(zip(quarantine["file"], quarantine["record"], quarantine["reason"])) == [
+        ("daily_sales_data_0.csv", "3", "invalid price"),
+        ("daily_sales_data_0.csv", "4", "invalid quantity; invalid date"),
+        ("daily_sales_data_0.csv", "5", "unknown region; date out of range"),
+        ("daily_sales_data_1.csv", "", "wrong number of fields"),
+        ("daily_sales_data_2.csv", "", "empty file"),
+        ("daily_sales_data_3.csv", "1", "undecodable bytes"),
+        ("daily_sales_data_3.csv", "2", "unknown region"),
+        ("daily_sales_data_4.csv", "", "unterminated quote"),
+        ("daily_sales_data_4.csv", "", "unterminated quote"),
+    ]
+    assert "pink morsel,$3.00,5,2018-02-07,north,extra" in quarantine["row"].tolist()
+
+    with open(validation.report_path_for(str(output_path))) as report_file:
+        report = json.load(report_file)
+    assert (report["accepted"], report["rejected"]) == (5, 9)
+    assert report["files"]["daily_sales_data_0.csv"]["reasons"]["invalid date"] == 1
+    assert report["files"]["daily_sales_data_1.csv"]["rejected"] == 1
+    assert report["files"]["daily_sales_data_2.csv"]["reasons"] == {"empty file": 1}
+    assert report["files"]["daily_sales_data_4.csv"]["reasons"] == {"unterminated quote": 2}
+
+    # Incremental runs rebuild the same quarantine and report from cached parts
+    cache_directory = tmp_path / "cache"
+    update_sales_data(data_directory, output_path, cache_directory, workers=1)
+    update_sales_data(data_directory, output_path, cache_directory, workers=1)
+    with open(validation.report_path_for(str(output_path))) as report_file:
+        assert json.load(report_file) == report
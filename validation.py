@@ -0,0 +1,170 @@
+import datetime
+import json
+import math
+import os
+
+import numpy as np
+
+import partitioned_dataset
+
+# Raw input rows are validated in bulk, one chunk at a time, before formatting.
+# Prices, quantities, dates, regions and products repeat heavily, so each check runs once per
+# distinct value and is broadcast back over the chunk. Rows failing any check are
+# quarantined with their reasons and the rest of the file carries on.
+REQUIRED_COLUMNS = ["product", "price", "quantity", "date", "region"]
+KNOWN_REGIONS = frozenset(["north", "south", "east", "west"])
+# Inclusive bounds on ISO dates; pass None to skip the range check
+DATE_RANGE = ("2000-01-01", "2099-12-31")
+QUARANTINE_FIELDNAMES = ["file", "record", "reason", "row"]
+# Quantities beyond this many digits would overflow int64
+MAX_QUANTITY_DIGITS = 18
+# Files are decoded with errors replaced by this character, so bad bytes reach validation
+REPLACEMENT_CHARACTER = "\ufffd"
+
+
+def quarantine_path_for(csv_path):
+    """Return the quarantine CSV that sits next to a formatted CSV"""
+    return os.path.splitext(csv_path)[0] + ".quarantine.csv"
+
+
+def report_path_for(csv_path):
+    """Return the validation report that sits next to a formatted CSV"""
+    return os.path.splitext(csv_path)[0] + ".validation.json"
+
+
+def parse_price(price):
+    """Return a '$'-prefixed, finite, non-negative amount as a float, or None"""
+    if not isinstance(price, str) or not price.startswith("$"):
+        return None
+    try:
+        value = float(price[1:])
+    except ValueError:
+        return None
+    return value if math.isfinite(value) and value >= 0 else None
+
+
+def parse_quantity(quantity):
+    """Return a non-negative integer quantity that fits in int64, or None"""
+    if (isinstance(quantity, str) and quantity.isascii() and quantity.isdigit()
+            and len(quantity) <= MAX_QUANTITY_DIGITS):
+        return int(quantity)
+    return None
+
+
+def valid_date(date):
+    """Check for a real YYYY-MM-DD calendar date"""
+    if not isinstance(date, str) or len(date) != 10:
+        return False
+    try:
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        return False
+    return True
+
+
+def valid_product(product):
+    """Check for a product name that can name its partition directory"""
+    return (isinstance(product, str) and product != ""
+            and len(partitioned_dataset.product_slug(product.lower())) <= partitioned_dataset.MAX_SLUG_LENGTH)
+
+
+def decodable(value):
+    """Check that a value had no undecodable bytes"""
+    return not isinstance(value, str) or REPLACEMENT_CHARACTER not in value
+
+
+def valid_region(region):
+    """Check for a known region, in any case"""
+    return isinstance(region, str) and region.lower() in KNOWN_REGIONS
+
+
+def parse_distinct(values, parse, dtype):
+    """Parse each distinct value of a Series once, returning (parsed values, valid mask)
+
+    Values that parse to None are invalid and left as zero.
+    """
+    codes, uniques = values.factorize(use_na_sentinel=False)
+    parsed = [parse(value) for value in uniques.tolist()]
+    valid = np.array([value is not None for value in parsed], dtype=bool)
+    parsed = np.array([0 if value is None else value for value in parsed], dtype=dtype)
+    return parsed[codes], valid[codes]
+
+
+def check_distinct(values, *checks):
+    """Apply each check once per distinct value of a Series, returning a boolean mask per check"""
+    codes, uniques = values.factorize(use_na_sentinel=False)
+    uniques = uniques.tolist()
+    return [np.array([check(value) for value in uniques], dtype=bool)[codes] for check in checks]
+
+
+def validate_chunk(chunk, date_range=DATE_RANGE):
+    """Check a chunk of raw string rows
+
+    Returns (valid mask, [(reason, failed mask)], {"price": floats, "quantity": ints});
+    prices and quantities are parsed as they are checked so formatting can reuse them.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        return np.zeros(len(chunk), dtype=bool), [
+            (f"missing column {', '.join(missing)}", np.ones(len(chunk), dtype=bool))
+        ], {}
+
+    date_checks = [valid_date]
+    if date_range is not None:
+        # Valid ISO dates compare correctly as strings
+        earliest, latest = date_range
+        date_checks.append(lambda date: isinstance(date, str) and earliest <= date <= latest)
+    prices, price_ok = parse_distinct(chunk["price"], parse_price, np.float64)
+    quantities, quantity_ok = parse_distinct(chunk["quantity"], parse_quantity, np.int64)
+    # Bad bytes fail every other column's check; only a product name could carry them through
+    product_ok, product_decoded = check_distinct(chunk["product"], valid_product, decodable)
+    (region_ok,) = check_distinct(chunk["region"], valid_region)
+    date_ok, *in_range = check_distinct(chunk["date"], *date_checks)
+    checks = [
+        ("invalid price", ~price_ok),
+        ("invalid quantity", ~quantity_ok),
+        ("invalid date", ~date_ok),
+        ("unknown region", ~region_ok),
+        ("invalid product", ~product_ok),
+        ("undecodable bytes", ~product_decoded),
+    ] + [("date out of range", date_ok & ~ok) for ok in in_range]
+
+    failures = [(reason, failed) for reason, failed in checks if failed.any()]
+    valid = np.ones(len(chunk), dtype=bool)
+    for _, failed in failures:
+        valid &= ~failed
+    return valid, failures, {"price": prices, "quantity": quantities}
+
+
+def quarantine_rows(file_name, chunk, valid, failures):
+    """Yield quarantine rows (file, record, reason, row) for a chunk's invalid rows
+
+    Records count parsed data rows from 1, so header, blank and unparseable lines are
+    not included.
+    """
+    invalid = np.flatnonzero(~valid)
+    columns = [chunk[column].to_numpy() for column in chunk.columns]
+    records = chunk.index.to_numpy()
+    for position in invalid:
+        reason = "; ".join(reason for reason, failed in failures if failed[position])
+        row = ",".join("" if not isinstance(column[position], str) else column[position] for column in columns)
+        yield file_name, int(records[position]) + 1, reason, row
+
+
+def count_reasons(summary, failures):
+    """Add a chunk's per-reason failure counts to a file summary"""
+    for reason, failed in failures:
+        summary["reasons"][reason] = summary["reasons"].get(reason, 0) + int(failed.sum())
+
+
+def write_report(summaries, report_path):
+    """Write per-file accepted/rejected counts with totals; returns the report"""
+    report = {
+        "files": summaries,
+        "accepted": sum(summary["accepted"] for summary in summaries.values()),
+        "rejected": sum(summary["rejected"] for summary in summaries.values()),
+    }
+    with open(report_path + ".tmp", mode="w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+    os.replace(report_path + ".tmp", report_path)
+    return report
@@ -0,0 +1,21 @@
+"""WSGI entry point for pre-fork servers such as gunicorn
+
+With preload_app (see gunicorn.conf.py, which serve.py runs), this module is
+imported once in the master, so the imports and the dataset are loaded before forking
+and every worker shares those pages copy-on-write; the dataset's columns are
+memory-mapped from the columnar store, written first if stale, so they stay
+shared after reloads too.
+Figures go through a cache directory shared by all workers. Threads don't
+survive a fork, so the data watcher and figure warm-up are started per worker.
+"""
+import gc
+
+import columnar_store
+from app import FILE_PATH, SHARED_CACHE_DIRECTORY, STORE_PATH, create_app
+
+columnar_store.ensure_store(FILE_PATH, STORE_PATH)
+app = create_app(watch_interval=None, fast_start=True, shared_cache=SHARED_CACHE_DIRECTORY or 'auto')
+server = app.server
+
+# Keep the preloaded objects out of the collector so it doesn't dirty shared pages
+gc.freeze()